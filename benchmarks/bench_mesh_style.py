@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Benchmark the mesh styles of :mod:`mpl_qt.mesh` on the Agg backend.
+
+Compares vertex count, build time and render time of the tile based mesh
+("cells", :func:`mpl_qt.mesh.mesh_verts_codes`) with the grid line based
+mesh ("lines", :func:`mpl_qt.mesh.mesh_lines`).
+
+Usage::
+
+    python benchmarks/bench_mesh_style.py -n 1000
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import sys
+import time
+import argparse
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+
+import mpl_qt.mesh as mesh
+
+
+def make_grid(n):
+    """Return sorted grid positions with shape (n, n, 2)."""
+    gx, gy = np.meshgrid(np.linspace(-5, 5, n), np.linspace(-5, 5, n),
+                         indexing="ij")
+    return np.dstack([gx, gy])
+
+
+def render(artist, xy):
+    fig = Figure()
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.add_artist(artist)
+    ax.set_xlim(xy[..., 0].min(), xy[..., 0].max())
+    ax.set_ylim(xy[..., 1].min(), xy[..., 1].max())
+    t0 = time.time()
+    canvas.draw()
+    return time.time() - t0
+
+
+def bench_cells(xy):
+    t0 = time.time()
+    verts, codes = mesh.mesh_verts_codes(xy[..., 0], xy[..., 1])
+    artist = PathPatch(Path(verts, codes), facecolor='none')
+    t_build = time.time() - t0
+    return len(verts), verts.nbytes + codes.nbytes, t_build, render(artist, xy)
+
+
+def bench_lines(xy):
+    t0 = time.time()
+    artist = LineCollection(mesh.mesh_lines(xy))
+    t_build = time.time() - t0
+    # segments are views of xy, every grid point is referenced twice
+    return 2 * xy.shape[0] * xy.shape[1], xy.nbytes, t_build, render(artist, xy)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--num", type=int, default=1000,
+                        help="number of grid points per axis")
+    args = parser.parse_args(argv)
+
+    xy = make_grid(args.num)
+    print("grid: {0}x{0}".format(args.num))
+    print("{:6s} {:>12s} {:>12s} {:>10s} {:>10s}".format(
+        "style", "vertices", "bytes", "build/s", "render/s"))
+    for name, bench in [("cells", bench_cells), ("lines", bench_lines)]:
+        print("{:6s} {:12d} {:12d} {:10.4f} {:10.4f}".format(name, *bench(xy)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
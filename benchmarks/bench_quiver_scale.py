@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""Benchmark a scale change of :class:`mpl_qt.ui.plot.QuiverPlotWidget`.
+
+Compares the full rebuild of the axes (``on_draw``) with the incremental
+update of the existing Quiver and QuiverKey artists (``scale`` setter).
+All arrows are drawn unless ``--lod`` enables the level of detail
+aggregation (see :mod:`mpl_qt.lod`).
+
+Usage::
+
+    python benchmarks/bench_quiver_scale.py -n 100000 -r 5
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import sys
+import timeit
+import argparse
+
+import numpy as np
+from PySide import QtGui
+
+import mpl_qt.ui.ui as ui
+import mpl_qt.ui.plot as plot
+
+
+def make_model(num):
+    """Return a QuiverModel with about num arrows on a square grid."""
+    n = int(np.ceil(np.sqrt(num)))
+    gx, gy = np.meshgrid(np.linspace(-5, 5, n), np.linspace(-5, 5, n))
+    pxy = np.array([gx.flatten(), gy.flatten()]).T
+    vxy = 0.1 * np.random.RandomState(0).standard_normal(pxy.shape)
+    return ui.QuiverModel(pxy, vxy)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--num", type=int, default=100000,
+                        help="number of arrows")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="number of scale changes to time")
+    parser.add_argument("--lod", action="store_true",
+                        help="draw the level of detail aggregation of large "
+                        "models")
+    args = parser.parse_args(argv)
+
+    app = QtGui.QApplication.instance() or QtGui.QApplication(sys.argv)
+    widget = plot.QuiverPlotWidget(model=make_model(args.num))
+    widget.renderer.lod = args.lod and widget.renderer.lod
+    scales = iter(np.linspace(0.5, 2.0, 2 * args.repeat + 2))
+
+    def rebuild():
+        widget.renderer.scale = next(scales)
+        widget.on_draw()
+
+    def update():
+        # the scale setter defers the update of hidden widgets
+        widget.renderer.scale = next(scales)
+        widget.on_update()
+
+    t_rebuild = min(timeit.repeat(rebuild, number=1, repeat=args.repeat))
+    t_update = min(timeit.repeat(update, number=1, repeat=args.repeat))
+
+    print("points:  {}".format(len(widget.model.xy)))
+    print("arrows:  {}".format(widget.renderer.quiver.N))
+    print("rebuild: {:8.4f} s".format(t_rebuild))
+    print("update:  {:8.4f} s".format(t_update))
+    print("speedup: {:8.2f}x".format(t_rebuild / t_update))
+    app.processEvents()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""Benchmark the startup time of the mpl_qt GUI application.
+
+Measures, in fresh interpreters, the time from process start to
+
+* the first visible main window (``MainWindow.show()`` processed) and
+* the first rendered plot (the current tab built and drawn),
+
+and breaks the import time down by top-level package using
+``python -X importtime``.
+
+Usage::
+
+    python benchmarks/bench_startup.py -r 5 [FILENAME]
+
+FILENAME is a data file to open (see :mod:`mpl_qt.loader`), the sample
+model of :class:`mpl_qt.ui.ui.MainWindow` is used by default.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import sys
+import time
+import argparse
+import collections
+import subprocess
+
+
+#: Started in a fresh interpreter, prints the timestamps of the stages.
+CHILD = """
+import sys
+import time
+from PySide import QtCore, QtGui
+
+app = QtGui.QApplication(sys.argv[:1])
+import mpl_qt.loader as loader
+import mpl_qt.ui.ui as ui
+
+model = loader.load(sys.argv[1]) if len(sys.argv) > 1 else None
+main_window = ui.MainWindow(parent=None, model=model)
+main_window.show()
+app.processEvents()
+print("window", time.time())
+
+def poll():
+    # the first tab is built from the event loop (MainWindow.set_model)
+    if main_window.quiver_plot is None:
+        QtCore.QTimer.singleShot(1, poll)
+        return
+    app.processEvents()
+    print("plot", time.time())
+    app.quit()
+
+QtCore.QTimer.singleShot(0, poll)
+app.exec_()
+"""
+
+
+def run_child(filename, importtime=False):
+    """Run the startup once.
+
+    Returns
+    -------
+    times : dict
+        Seconds from process start per stage.
+    stderr : str
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", CHILD]
+    if filename:
+        command.append(filename)
+    t0 = time.time()
+    child = subprocess.Popen(command, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+    stdout, stderr = child.communicate()
+    if child.returncode:
+        raise RuntimeError("startup failed:\n" + stderr)
+    times = {}
+    for line in stdout.splitlines():
+        stage, _, stamp = line.partition(" ")
+        if stage in ("window", "plot"):
+            times[stage] = float(stamp) - t0
+    return times, stderr
+
+
+def import_breakdown(stderr):
+    """Sum the cumulative import times (s) per top-level package.
+
+    Parameters
+    ----------
+    stderr : str
+        Output of ``python -X importtime``.
+
+    Returns
+    -------
+    collections.Counter
+    """
+    totals = collections.Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2]
+        # top-level imports are not indented
+        if not name.startswith("  "):
+            totals[name.strip().split(".")[0]] += int(fields[1]) * 1e-6
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("filename", nargs="?", help="data file to open")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="number of timed startups")
+    parser.add_argument("-t", "--top", type=int, default=15,
+                        help="number of packages in the import breakdown")
+    args = parser.parse_args(argv)
+
+    # import mpl_qt from this checkout
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.environ["PYTHONPATH"] = os.pathsep.join(
+        [root] + [p for p in [os.environ.get("PYTHONPATH")] if p])
+
+    runs = [run_child(args.filename)[0] for _ in range(args.repeat)]
+    print("{:8s} {:>10s} {:>10s} {:>10s}".format("stage", "min/s",
+                                                 "median/s", "max/s"))
+    for stage in ["window", "plot"]:
+        times = sorted(run[stage] for run in runs)
+        print("{:8s} {:10.3f} {:10.3f} {:10.3f}".format(
+            stage, times[0], times[len(times) // 2], times[-1]))
+
+    _, stderr = run_child(args.filename, importtime=True)
+    totals = import_breakdown(stderr)
+    print()
+    print("import time by package (-X importtime, cumulative)")
+    print("{:24s} {:>10s}".format("package", "time/s"))
+    for name, seconds in totals.most_common(args.top):
+        print("{:24s} {:10.3f}".format(name, seconds))
+    print("{:24s} {:10.3f}".format("total", sum(totals.values())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
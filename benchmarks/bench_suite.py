@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+"""Benchmark suite of the grid, mesh and quiver hot paths.
+
+Times (best of ``--repeat``) and measures the peak memory (tracemalloc, in a
+separate run) of
+
+============== =========================================================
+case           code
+============== =========================================================
+grid_size      :func:`mpl_qt.grid.grid_size` of the x coordinates
+mesh_verts     :func:`mpl_qt.mesh.mesh_verts_codes` (the implementation
+               of ``MeshplotWidget._mesh_verts_codes``)
+quiver_draw    full draw of the quiver plot (LOD cache dropped)
+mesh_draw      full draw of the mesh plot (topology dropped)
+mesh_triangles scale change of the triangle mesh plot (triangulation
+               cached, displaced vertices moved in place)
+heatmap_draw   redraw of the magnitude heatmap (image at screen resolution,
+               pyramid dropped)
+point_index    build of the spatial index (:mod:`mpl_qt.spatial`)
+nearest        1000 nearest point queries (pick radius of 1% of the
+               width) on the spatial index
+mesh_field     all derived fields of the values (:mod:`mpl_qt.fields`,
+               gradient and fields not cached)
+affine_fit     affine fit and residual of the values (:mod:`mpl_qt.affine`,
+               pseudo-inverse precomputed)
+============== =========================================================
+
+on square grids of 10^2 to 10^7 points. The plots are drawn with the
+renderers of ``QuiverPlotWidget`` and ``MeshplotWidget``
+(:mod:`mpl_qt.render`) and rasterized on an Agg canvas, no GUI is needed.
+
+The results are saved as JSON. With ``--compare`` the run fails (exit code
+1) if a case got slower (or used more memory) than the baseline by more
+than the threshold factor.
+
+Usage::
+
+    python benchmarks/bench_suite.py -o baseline.json
+    python benchmarks/bench_suite.py -o new.json --compare baseline.json
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import sys
+import json
+import time
+import timeit
+import platform
+import argparse
+import tracemalloc
+
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import mpl_qt.affine as affine
+import mpl_qt.fields as fields
+import mpl_qt.grid as grid
+import mpl_qt.mesh as mesh
+import mpl_qt.render as render
+import mpl_qt.spatial as spatial
+from mpl_qt.model import QuiverModel
+
+
+#: Default grid sizes (number of points).
+SIZES = [10**k for k in range(2, 8)]
+
+
+def make_grid(num):
+    """Return positions with shape (n*n, 2) of a square grid, n*n ~ num,
+    and displacements of a rotation."""
+    n = max(int(round(np.sqrt(num))), 2)
+    gx, gy = np.meshgrid(np.linspace(-5, 5, n), np.linspace(-5, 5, n),
+                         indexing="ij")
+    xy = np.column_stack([gx.ravel(), gy.ravel()])
+    phi = 0.05
+    rotation = np.array([[np.cos(phi), np.sin(phi)],
+                         [-np.sin(phi), np.cos(phi)]])
+    return xy, np.dot(xy, rotation) - xy
+
+
+def case_grid_size(xy, xyvalue):
+    x = xy[:, 0]
+    return lambda: grid.grid_size(x)
+
+
+def case_mesh_verts(xy, xyvalue):
+    n = int(round(np.sqrt(len(xy))))
+    gx, gy = xy[:, 0].reshape(n, n), xy[:, 1].reshape(n, n)
+    return lambda: mesh.mesh_verts_codes(gx, gy)
+
+
+def _renderer(cls, xy, xyvalue):
+    fig = Figure()
+    canvas = FigureCanvasAgg(fig)
+    return cls(render.setup_axes(fig), QuiverModel(xy, xyvalue)), canvas
+
+
+def case_quiver_draw(xy, xyvalue):
+    renderer, canvas = _renderer(render.QuiverRenderer, xy, xyvalue)
+
+    def draw():
+        renderer._lod_cache = None
+        renderer.draw()
+        canvas.draw()
+    return draw
+
+
+def case_mesh_draw(xy, xyvalue):
+    renderer, canvas = _renderer(render.MeshRenderer, xy, xyvalue)
+
+    def draw():
+        renderer._topology = None
+        renderer.draw()
+        canvas.draw()
+    return draw
+
+
+def case_mesh_triangles(xy, xyvalue):
+    renderer, canvas = _renderer(render.MeshRenderer, xy, xyvalue)
+    renderer.mesh_style = "triangles"
+    renderer.draw()
+
+    def scale():
+        renderer.scale = 3.0 - renderer.scale
+        renderer.update()
+        canvas.draw()
+    return scale
+
+
+def case_heatmap_draw(xy, xyvalue):
+    renderer, canvas = _renderer(render.HeatmapRenderer, xy, xyvalue)
+    renderer.draw()
+
+    def draw():
+        renderer._pyramid = None
+        renderer.update()
+        canvas.draw()
+    return draw
+
+
+def case_point_index(xy, xyvalue):
+    return lambda: spatial.PointIndex(xy)
+
+
+def case_nearest(xy, xyvalue):
+    index = spatial.PointIndex(xy)
+    queries = np.random.RandomState(0).uniform(-5, 5, (1000, 2))
+
+    def nearest():
+        for x, y in queries:
+            index.nearest(x, y, 0.1)
+    return nearest
+
+
+def case_mesh_field(xy, xyvalue):
+    topology = mesh.MeshTopology(xy)
+
+    def derive():
+        topology.values_changed()
+        for name in fields.FIELDS:
+            topology.field(name, xyvalue)
+    return derive
+
+
+def case_affine_fit(xy, xyvalue):
+    fit = affine.AffineFit(xy)
+    return lambda: fit.fit(xyvalue, displacements=True)
+
+
+#: Benchmark cases: name, setup(xy, xyvalue) returning the timed callable.
+CASES = [
+    ("grid_size", case_grid_size),
+    ("mesh_verts", case_mesh_verts),
+    ("quiver_draw", case_quiver_draw),
+    ("mesh_draw", case_mesh_draw),
+    ("mesh_triangles", case_mesh_triangles),
+    ("heatmap_draw", case_heatmap_draw),
+    ("point_index", case_point_index),
+    ("nearest", case_nearest),
+    ("mesh_field", case_mesh_field),
+    ("affine_fit", case_affine_fit),
+]
+
+
+def peak_memory(func):
+    """Return the peak memory (bytes) traced while calling func."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(cases, sizes, repeat):
+    """Run the cases.
+
+    Returns
+    -------
+    list of dict
+        name, size, time (best, s), times (s), peak_memory (bytes)
+    """
+    results = []
+    for size in sizes:
+        xy, xyvalue = make_grid(size)
+        for name, setup in cases:
+            func = setup(xy, xyvalue)
+            times = timeit.repeat(func, number=1, repeat=repeat)
+            result = dict(name=name, size=len(xy), time=min(times),
+                          times=times, peak_memory=peak_memory(func))
+            print("{name:14s} {size:10d} {time:10.4f} "
+                  "{peak_memory:14d}".format(**result))
+            sys.stdout.flush()
+            results.append(result)
+    return results
+
+
+def compare(results, baseline, threshold, memory_threshold, min_time=1e-3):
+    """Return the regressions of results against baseline (messages).
+
+    A case regressed if its time (peak memory) exceeds the baseline times
+    threshold (memory_threshold). Times shorter than min_time (s) are too
+    noisy to compare and ignored.
+    """
+    reference = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = reference.get((result["name"], result["size"]))
+        if base is None:
+            continue
+        for key, factor in [("time", threshold),
+                            ("peak_memory", memory_threshold)]:
+            if key == "time" and base[key] < min_time:
+                continue
+            if result[key] > factor * base[key]:
+                regressions.append(
+                    "{} {}: {} {:.4g} > {:.2f} x {:.4g}".format(
+                        result["name"], result["size"], key, result[key],
+                        factor, base[key]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", default=SIZES,
+                        help="numbers of grid points")
+    parser.add_argument("-c", "--cases", nargs="+",
+                        default=[name for name, _ in CASES],
+                        choices=[name for name, _ in CASES],
+                        help="cases to run")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="number of timed calls per case")
+    parser.add_argument("-o", "--output", help="save the results (JSON)")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="fail on regressions against BASELINE (JSON)")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="allowed time factor against the baseline")
+    parser.add_argument("--memory-threshold", type=float, default=1.25,
+                        help="allowed peak memory factor against the "
+                        "baseline")
+    parser.add_argument("--min-time", type=float, default=1e-3,
+                        help="ignore times (s) below in the comparison")
+    args = parser.parse_args(argv)
+
+    cases = [(name, setup) for name, setup in CASES if name in args.cases]
+
+    print("{:14s} {:>10s} {:>10s} {:>14s}".format("case", "points", "time/s",
+                                                    "peak memory/B"))
+    results = run(cases, sorted(args.sizes), args.repeat)
+    report = dict(
+        meta=dict(timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  platform=platform.platform(),
+                  python=platform.python_version(),
+                  numpy=np.__version__,
+                  matplotlib=matplotlib.__version__,
+                  repeat=args.repeat),
+        results=results)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline),
+                                  args.threshold, args.memory_threshold,
+                                  args.min_time)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
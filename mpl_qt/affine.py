@@ -0,0 +1,160 @@
+"""Least squares affine transformations between point sets.
+
+Transformations are homogeneous 3x3 matrices applied to row vectors (the
+convention of ``samples/test_linear_transformation.ipynb``)::
+
+    [x', y', 1] = [x, y, 1] . m
+
+    m = | a   b   0 |
+        | c   d   0 |
+        | tx  ty  1 |
+
+:class:`AffineFit` fits many frames of the same reference positions: the
+pseudo-inverse of the homogeneous reference coordinates is computed once,
+the fit of all frames is a single batched matrix product. The residuals are
+the non-affine part of the frames.
+"""
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+
+
+def homogeneous_coords(xy):
+    """Return a copy of xy with an additional coordinate (== 1).
+
+    Parameters
+    ----------
+    xy : array with shape = (..., n)
+        Points with n coordinates.
+
+    Returns
+    -------
+    array with shape = (..., n + 1)
+    """
+    xy = np.asarray(xy, dtype=float)
+    return np.concatenate([xy, np.ones(xy.shape[:-1] + (1,))], axis=-1)
+
+
+def linear_transformation(a, b):
+    """Least squares fit of the affine transformation of points a to b.
+
+    Parameters
+    ----------
+    a, b : arrays with shape = (n, 2)
+
+    Returns
+    -------
+    array with shape = (3, 3)
+    """
+    return AffineFit(a).transforms(b)
+
+
+def transform(xy, m):
+    """Apply the transformations m to the points xy.
+
+    Parameters
+    ----------
+    xy : array with shape = (n, 2)
+    m : array with shape = (3, 3) or (nframes, 3, 3)
+
+    Returns
+    -------
+    array with shape = (n, 2) or (nframes, n, 2)
+    """
+    return np.matmul(xy, m[..., :2, :2]) + m[..., np.newaxis, 2, :2]
+
+
+def decompose(m):
+    """Decompose transformations into translation, scaling and rotation.
+
+    Parameters
+    ----------
+    m : array with shape = (3, 3) or (nframes, 3, 3)
+
+    Returns
+    -------
+    tx, ty, sx, sy, phi : floats or arrays with shape = (nframes,)
+        phi in rad.
+    """
+    tx, ty = m[..., 2, 0], m[..., 2, 1]
+    a, b, c, d = m[..., 0, 0], m[..., 0, 1], m[..., 1, 0], m[..., 1, 1]
+    sx = np.sign(a) * np.hypot(a, b)
+    sy = np.sign(d) * np.hypot(c, d)
+    phi = np.arctan2(-b, a)
+    return tx, ty, sx, sy, phi
+
+
+class AffineFit(object):
+    """Least squares affine fit of frames of fixed reference positions.
+
+    Parameters
+    ----------
+    xy : array with shape = (n, 2)
+        Reference positions, non-finite positions are not fitted.
+
+    Attributes
+    ----------
+    valid : array of bool with shape = (n,)
+        Finite reference positions.
+    pinv : array with shape = (3, m)
+        Pseudo-inverse of the homogeneous coordinates of the m valid
+        reference positions.
+    """
+
+    def __init__(self, xy):
+        self.xy = xy
+        self.valid = np.isfinite(xy).all(axis=1)
+        self.pinv = np.linalg.pinv(homogeneous_coords(xy[self.valid]))
+
+    def transforms(self, frames, displacements=False):
+        """Fit the transformations of the reference positions to frames.
+
+        Parameters
+        ----------
+        frames : array with shape = (n, 2) or (nframes, n, 2)
+            Positions of the reference points in every frame, must be
+            finite at the valid reference positions.
+        displacements : bool
+            frames are displacements of the reference positions (eg.
+            ``model.xyvalue``) instead of positions.
+
+        Returns
+        -------
+        array with shape = (3, 3) or (nframes, 3, 3)
+        """
+        frames = np.asarray(frames)
+        if not self.valid.all():
+            frames = frames[..., self.valid, :]
+        m = np.zeros(frames.shape[:-2] + (3, 3))
+        # the last column of the fit is always (0, 0, 1)
+        m[..., :2] = np.matmul(self.pinv, frames)
+        m[..., 2, 2] = 1
+        if displacements:
+            m[..., 0, 0] += 1
+            m[..., 1, 1] += 1
+        return m
+
+    def fit(self, frames, displacements=False):
+        """Fit the transformations and return them with the residuals.
+
+        Parameters
+        ----------
+        frames : array with shape = (n, 2) or (nframes, n, 2)
+        displacements : bool
+            See :meth:`transforms`.
+
+        Returns
+        -------
+        transforms : array with shape = (3, 3) or (nframes, 3, 3)
+        residuals : array with the shape of frames
+            Non-affine part of the frames (frames minus the transformed
+            reference positions), nan at invalid reference positions.
+        """
+        m = self.transforms(frames, displacements)
+        residuals = frames - transform(self.xy, m)
+        if displacements:
+            residuals += self.xy
+        return m, residuals
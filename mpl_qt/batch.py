@@ -0,0 +1,200 @@
+"""Render datasets to image files headless, in parallel.
+
+The datasets (files readable by :func:`mpl_qt.loader.load`) are distributed
+over a process pool. Every worker renders all its datasets on a single Agg
+figure (see :mod:`mpl_qt.render`), created once when the worker starts.
+Each dataset is written as ``<name>_<kind>.<format>`` per plot kind
+(quiver, mesh, heatmap) and format (eg. png, pdf).
+
+Usage::
+
+    mpl_qt_render -o OUTDIR -f png pdf -j 8 DATADIR [DATADIR ...]
+"""
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import os
+import sys
+import time
+import logging
+import argparse
+import traceback
+import multiprocessing
+import os.path as op
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import mpl_qt.fields as fields
+import mpl_qt.loader as loader
+import mpl_qt.render as render
+
+
+LOGGER = logging.getLogger(__name__)
+
+#: Plot kinds and their renderers.
+RENDERERS = {"quiver": render.QuiverRenderer, "mesh": render.MeshRenderer,
+             "heatmap": render.HeatmapRenderer}
+
+#: Figure of the worker process (see :func:`init_worker`).
+_figure = None
+
+
+def init_worker(figsize=(8, 6), dpi=100):
+    """Create the figure of the worker process."""
+    global _figure
+    _figure = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(_figure)
+    render.setup_axes(_figure)
+
+
+def find_datasets(paths):
+    """Return the dataset files of paths (files or directories), sorted."""
+    extensions = loader.NPY_EXTENSIONS + loader.HDF5_EXTENSIONS
+    filenames = []
+    for path in paths:
+        if op.isdir(path):
+            filenames.extend(op.join(path, name)
+                             for name in sorted(os.listdir(path))
+                             if op.splitext(name)[1].lower() in extensions)
+        else:
+            filenames.append(path)
+    return filenames
+
+
+def render_file(job):
+    """Render one dataset with the figure of the worker.
+
+    Parameters
+    ----------
+    job : tuple
+        filename, output directory, plot kinds, formats and renderer
+        attributes (dict, eg. scale).
+
+    Returns
+    -------
+    filename : str
+    outputs : list of str
+        Written files.
+    error : str or None
+        Traceback if the dataset failed.
+    """
+    filename, outdir, kinds, formats, options = job
+    ax = _figure.axes[0]
+    base = op.splitext(op.basename(filename))[0]
+    outputs = []
+    try:
+        model = loader.load(filename)
+        for kind in kinds:
+            renderer = RENDERERS[kind](ax, model)
+            for name, value in options.items():
+                if hasattr(renderer, name):
+                    setattr(renderer, name, value)
+            renderer.draw()
+            for fmt in formats:
+                output = op.join(outdir, "{}_{}.{}".format(base, kind, fmt))
+                _figure.savefig(output)
+                outputs.append(output)
+    except Exception:
+        return filename, outputs, traceback.format_exc()
+    return filename, outputs, None
+
+
+def render_files(filenames, outdir, kinds=("quiver", "mesh"), formats=("png",),
+                 options=None, processes=None, figsize=(8, 6), dpi=100):
+    """Render the datasets filenames in a pool of processes.
+
+    Parameters
+    ----------
+    processes : int, optional
+        Number of worker processes, defaults to the number of CPUs. With 1
+        the datasets are rendered in this process.
+
+    Yields
+    ------
+    filename, outputs, error
+        See :func:`render_file`, in order of completion.
+    """
+    jobs = [(filename, outdir, tuple(kinds), tuple(formats), options or {})
+            for filename in filenames]
+    if processes == 1:
+        init_worker(figsize, dpi)
+        for job in jobs:
+            yield render_file(job)
+        return
+    pool = multiprocessing.Pool(processes, initializer=init_worker,
+                                initargs=(figsize, dpi))
+    try:
+        for result in pool.imap_unordered(render_file, jobs):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render datasets to image files headless, in parallel.")
+    parser.add_argument("paths", nargs="+",
+                        help="dataset files or directories")
+    parser.add_argument("-o", "--outdir", default=".",
+                        help="output directory")
+    parser.add_argument("-f", "--formats", nargs="+", default=["png"],
+                        help="output formats (eg. png, pdf)")
+    parser.add_argument("-k", "--kinds", nargs="+", default=["quiver", "mesh"],
+                        choices=sorted(RENDERERS), help="plot kinds")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes (default: CPUs)")
+    parser.add_argument("--size", type=float, nargs=2, default=(8, 6),
+                        metavar=("WIDTH", "HEIGHT"),
+                        help="figure size (inches)")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--scale", type=float, help="quiver/mesh scale")
+    parser.add_argument("--mesh-style", choices=render.MeshRenderer.MESH_STYLES)
+    parser.add_argument("--field", choices=list(fields.FIELDS),
+                        help="color the displaced mesh by a derived field")
+    parser.add_argument("--quantity",
+                        choices=render.HeatmapRenderer.QUANTITIES,
+                        help="heatmap quantity")
+    parser.add_argument("--residual", action="store_true",
+                        help="show the non-affine residual of the values")
+    args = parser.parse_args(argv)
+
+    filenames = find_datasets(args.paths)
+    if not op.isdir(args.outdir):
+        os.makedirs(args.outdir)
+    options = {}
+    if args.scale is not None:
+        options["scale"] = args.scale
+    if args.mesh_style is not None:
+        options["mesh_style"] = args.mesh_style
+    if args.field is not None:
+        options["field"] = args.field
+    if args.quantity is not None:
+        options["quantity"] = args.quantity
+    if args.residual:
+        options["residual"] = True
+
+    figures = 0
+    failed = []
+    t0 = time.time()
+    for filename, outputs, error in render_files(
+            filenames, args.outdir, args.kinds, args.formats, options,
+            args.jobs, tuple(args.size), args.dpi):
+        figures += len(outputs)
+        if error is not None:
+            failed.append(filename)
+            print("FAILED {}\n{}".format(filename, error), file=sys.stderr)
+        else:
+            LOGGER.info("rendered %s", filename)
+    elapsed = time.time() - t0
+
+    print("{} datasets, {} figures in {:.2f} s: {:.2f} figures/s".format(
+        len(filenames), figures, elapsed,
+        figures / elapsed if elapsed > 0 else float("nan")))
+    if failed:
+        print("{} datasets failed".format(len(failed)), file=sys.stderr)
+        return 1
+    return 0
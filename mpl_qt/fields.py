@@ -0,0 +1,155 @@
+"""Deformation fields derived from displacements on a grid.
+
+The displacement gradient of every grid tile (cell) is calculated at once by
+finite differences on the ``(nx, ny)`` grid arrays (see
+:ref:`definition_of_grid`): the difference along an edge, averaged over the
+two opposite edges of the cell, divided by the edge length. With
+``u, v`` the displacements in x and y the derived fields are
+
+============== ===============================================
+field          definition
+============== ===============================================
+``exx``        du/dx (normal strain)
+``eyy``        dv/dy (normal strain)
+``exy``        (du/dy + dv/dx) / 2 (shear strain)
+``shear``      sqrt(((exx - eyy) / 2)**2 + exy**2) (maximum
+               shear strain)
+``rotation``   (dv/dx - du/dy) / 2 (rad)
+``area``       relative area change, det(1 + gradient) - 1
+``divergence`` du/dx + dv/dy
+``curl``       dv/dx - du/dy
+============== ===============================================
+
+Cells touching a missing grid point are nan. Irregular points use the
+triangles of a triangulation as cells (:func:`triangle_gradient`), with
+the gradient of the linear interpolation in each triangle.
+"""
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import collections
+
+import numpy as np
+
+
+#: Derived fields and their labels.
+FIELDS = collections.OrderedDict([
+    ("exx", "strain xx"),
+    ("eyy", "strain yy"),
+    ("exy", "shear strain xy"),
+    ("shear", "max. shear strain"),
+    ("rotation", "rotation / rad"),
+    ("area", "area change"),
+    ("divergence", "divergence"),
+    ("curl", "curl"),
+])
+
+
+def displacement_gradient(grid, dgrid):
+    """Calculate the displacement gradient of every grid tile.
+
+    Parameters
+    ----------
+    grid : array with shape = (nx, ny, 2)
+        Grid positions, nan for missing grid points.
+    dgrid : array with shape = (nx, ny, 2)
+        Displacements at the grid positions.
+
+    Returns
+    -------
+    array with shape = (nx-1, ny-1, 2, 2)
+        ``gradient[i, j, k, l]`` is the derivative of displacement k along
+        coordinate l of tile (i, j).
+    """
+    # differences along x (axis 0) and y (axis 1), mean of opposite edges
+    dx = 0.5 * ((grid[1:, :-1, 0] - grid[:-1, :-1, 0]) +
+                (grid[1:, 1:, 0] - grid[:-1, 1:, 0]))
+    dy = 0.5 * ((grid[:-1, 1:, 1] - grid[:-1, :-1, 1]) +
+                (grid[1:, 1:, 1] - grid[1:, :-1, 1]))
+    gradient = np.empty(dx.shape + (2, 2))
+    gradient[..., 0] = 0.5 * ((dgrid[1:, :-1] - dgrid[:-1, :-1]) +
+                              (dgrid[1:, 1:] - dgrid[:-1, 1:]))
+    gradient[..., 1] = 0.5 * ((dgrid[:-1, 1:] - dgrid[:-1, :-1]) +
+                              (dgrid[1:, 1:] - dgrid[1:, :-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gradient[..., 0] /= dx[..., np.newaxis]
+        gradient[..., 1] /= dy[..., np.newaxis]
+    return gradient
+
+
+def triangle_gradient(xy, triangles, xyvalue):
+    """Calculate the displacement gradient of every triangle.
+
+    Parameters
+    ----------
+    xy : array with shape = (n, 2)
+        Positions.
+    triangles : array of int with shape = (ntri, 3)
+        Indices into xy of the triangle corners.
+    xyvalue : array with shape = (n, 2)
+        Displacements at the positions.
+
+    Returns
+    -------
+    array with shape = (ntri, 2, 2)
+        See :func:`displacement_gradient`, nan for degenerate triangles.
+    """
+    p0 = xy[triangles[:, 0]]
+    e1 = xy[triangles[:, 1]] - p0
+    e2 = xy[triangles[:, 2]] - p0
+    u0 = xyvalue[triangles[:, 0]]
+    du1 = xyvalue[triangles[:, 1]] - u0
+    du2 = xyvalue[triangles[:, 2]] - u0
+    # solve gradient . [e1 e2] = [du1 du2] with the explicit 2x2 inverse
+    det = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv = np.empty((len(det), 2, 2))
+        inv[:, 0, 0] = e2[:, 1] / det
+        inv[:, 0, 1] = -e2[:, 0] / det
+        inv[:, 1, 0] = -e1[:, 1] / det
+        inv[:, 1, 1] = e1[:, 0] / det
+    inv[det == 0] = np.nan
+    du = np.stack([du1, du2], axis=-1)
+    return np.matmul(du, inv)
+
+
+def derived_field(name, gradient):
+    """Calculate a derived field of the displacements.
+
+    The fields describe the real deformation, they do not depend on the
+    display scale of the displacements.
+
+    Parameters
+    ----------
+    name : str
+        One of :data:`FIELDS`.
+    gradient : array with shape = (..., 2, 2)
+        Displacement gradient (see :func:`displacement_gradient` and
+        :func:`triangle_gradient`).
+
+    Returns
+    -------
+    array with the shape of the cells of gradient
+    """
+    if name not in FIELDS:
+        raise ValueError("unknown field {!r}, expected one of {}".format(
+            name, ", ".join(FIELDS)))
+    ux, uy = gradient[..., 0, 0], gradient[..., 0, 1]
+    vx, vy = gradient[..., 1, 0], gradient[..., 1, 1]
+    if name == "exx":
+        return ux
+    if name == "eyy":
+        return vy
+    if name == "exy":
+        return 0.5 * (uy + vx)
+    if name == "shear":
+        return np.hypot(0.5 * (ux - vy), 0.5 * (uy + vx))
+    if name == "rotation":
+        return 0.5 * (vx - uy)
+    if name == "area":
+        return ux + vy + ux * vy - uy * vx
+    if name == "divergence":
+        return ux + vy
+    return vx - uy
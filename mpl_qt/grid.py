@@ -39,7 +39,13 @@ from __future__ import division
 from __future__ import absolute_import
 
 import numpy as np
-import quantities as pq
+
+
+#: Default number of values processed at once by the chunked estimators.
+CHUNKSIZE = 2**20
+
+#: Default maximum number of distinct values kept by the chunked estimators.
+MAX_UNIQUE = 2**20
 
 
 def grid_size(x, tolerance=0.001):
@@ -47,22 +53,198 @@ def grid_size(x, tolerance=0.001):
     number of grid points.
 
     Use heuristic to account for missing or non-grid conforming values in x
-    (tolerance).
+    (tolerance). Non-finite values (missing points) are ignored.
 
     Parameters
     ----------
     tolerance : float
         Relative tolerance for step width.
 
+    Returns
+    -------
+    (float, float, float, int) :
+        (start, end, step, num) (see :ref:`definition_of_grid`),
+        (0, 0, 0, 1) if x has no finite values
+    """
+    x = np.asarray(x)
+    return _grid_size_unique(np.unique(x[np.isfinite(x)]), tolerance)
+
+
+def grid_size_chunked(x, tolerance=0.001, chunksize=CHUNKSIZE,
+                      max_unique=MAX_UNIQUE):
+    """Memory-bounded variant of :func:`grid_size`.
+
+    See :func:`grid_sizes` for the parameters.
+
+    Parameters
+    ----------
+    x : array-like with shape = (n,)
+
     Returns
     -------
     (float, float, float, int) :
         (start, end, step, num) (see :ref:`definition_of_grid`)
     """
-    if x.max() == x.min():
-        return x.max(), x.max(), 0, 1
-    dx = np.diff(np.sort(np.unique(x)))
-    tolerance = tolerance * np.abs(x.max() - x.min()) / dx.shape[0]
+    return grid_sizes(x, tolerance, chunksize, max_unique)[0]
+
+
+def grid_sizes(xy, tolerance=0.001, chunksize=CHUNKSIZE, max_unique=MAX_UNIQUE):
+    """Estimate grid parameters for all columns of xy in one chunked pass.
+
+    xy is read in chunks of chunksize rows, only the sorted distinct finite
+    values of each column are kept. The result equals :func:`grid_size` per
+    column with at most max_unique distinct values, but the extra memory is
+    bounded by chunksize and max_unique instead of growing with the size of
+    xy.
+
+    Parameters
+    ----------
+    xy : array-like with shape = (n, d) or (n,)
+        Anything supporting ``len`` and slicing along the first axis, eg.
+        numpy.memmap, h5py.Dataset or a nested list.
+    tolerance : float
+        Relative tolerance for step width.
+    chunksize : int
+        Number of rows read at once.
+    max_unique : int
+        Maximum number of distinct values kept per column. Once a column has
+        more distinct values, values closer than ``tolerance * (end -
+        start) / max_unique`` are merged first (jitter around the grid
+        points, far below the step of any grid with fewer than max_unique
+        points). If there are still too many, they are thinned evenly (every
+        k-th value) and no further values are merged: the step is estimated
+        from the distinct values read until then (divided by k), start and
+        end are still exact. With an irregular spacing of those values the
+        step is only approximate.
+
+    Returns
+    -------
+    list of d (float, float, float, int) :
+        (start, end, step, num) per column (see :ref:`definition_of_grid`)
+    """
+    shape = np.shape(xy)
+    ndim = 1 if len(shape) == 1 else shape[1]
+    uniques = [_UniqueValues(max_unique, tolerance) for _ in range(ndim)]
+    for i in range(0, len(xy), chunksize):
+        chunk = np.asarray(xy[i:i + chunksize])
+        if chunk.ndim == 1:
+            chunk = chunk[:, np.newaxis]
+        for k in range(ndim):
+            uniques[k].merge(chunk[:, k])
+    return [u.grid_size() for u in uniques]
+
+
+def grid_index(x, start, step):
+    """Map positions x to the indices of their nearest grid points.
+
+    Parameters
+    ----------
+    x : array
+        Positions.
+    start, step : float
+        Grid parameters (see :ref:`definition_of_grid`).
+
+    Returns
+    -------
+    array of int with the shape of x
+    """
+    if step == 0:
+        return np.zeros(np.shape(x), dtype=np.intp)
+    return np.rint((np.asarray(x) - start) / step).astype(np.intp)
+
+
+def grid_nodes(xy, grids):
+    """Locate the points xy on a (possibly incompletely filled) grid.
+
+    Each point is mapped directly to its grid node (linear time, no sort).
+    If several points map to the same node the last one wins.
+
+    Parameters
+    ----------
+    xy : array with shape = (n, d)
+        Positions, points with non-finite coordinates are missing.
+    grids : sequence of d (start, end, step, num)
+        Grid parameters per column of xy (see :func:`grid_sizes`).
+
+    Returns
+    -------
+    masked array of int with shape = (num_0, ..., num_d-1)
+        Index into xy of the point at each grid node, masked where no point
+        was found.
+    """
+    shape = tuple(int(g[3]) for g in grids)
+    valid = np.isfinite(xy).all(axis=1)
+    points = np.arange(xy.shape[0])
+    if not valid.all():
+        xy = xy[valid]
+        points = points[valid]
+    ij = [grid_index(xy[:, k], g[0], g[2]) for k, g in enumerate(grids)]
+    flat = np.ravel_multi_index(ij, shape, mode="clip")
+    nodes = np.empty(int(np.prod(shape)), dtype=np.intp)
+    nodes.fill(-1)
+    nodes[flat] = points
+    return np.ma.masked_less(nodes.reshape(shape), 0)
+
+
+class _UniqueValues(object):
+    """Sorted distinct values of a column read in chunks, values within the
+    tolerance merged and thinned once to at most max_unique values (see
+    :func:`grid_sizes`)."""
+
+    def __init__(self, max_unique, tolerance):
+        self.max_unique = max_unique
+        self.tolerance = tolerance
+        self.values = None
+        self.stride = 1
+        self.start = np.inf
+        self.end = -np.inf
+
+    def merge(self, x):
+        """Merge the distinct finite values of x."""
+        x = x[np.isfinite(x)]
+        if not len(x):
+            return
+        self.start = min(self.start, x.min())
+        self.end = max(self.end, x.max())
+        if self.stride > 1:
+            # merging into the thinned values would make their spacing uneven
+            return
+        if self.values is None:
+            self.values = np.unique(x)
+        else:
+            self.values = np.union1d(self.values, x)
+        if self.values.shape[0] > self.max_unique:
+            # keep the first value of each run of close values
+            eps = self.tolerance * (self.end - self.start) / self.max_unique
+            keep = np.ones(self.values.shape, dtype=bool)
+            keep[1:] = np.diff(self.values) > eps
+            self.values = self.values[keep]
+        if self.values.shape[0] > self.max_unique:
+            self.stride = -(-self.values.shape[0] // self.max_unique)
+            self.values = self.values[::self.stride]
+
+    def grid_size(self):
+        if self.values is None:
+            return _grid_size_unique(np.empty(0), self.tolerance)
+        x0, x1, dx, nx = _grid_size_unique(self.values, self.tolerance)
+        if x0 == self.start and x1 == self.end and self.stride == 1:
+            return x0, x1, dx, nx
+        # merged or thinned values: exact start and end
+        dx = dx / self.stride
+        return (self.start, self.end, dx,
+                np.round((self.end - self.start) / dx + 1))
+
+
+def _grid_size_unique(ux, tolerance):
+    """Estimate grid parameters from the sorted distinct values ux."""
+    if not len(ux):
+        return 0.0, 0.0, 0, 1
+    x0 = ux[0]
+    x1 = ux[-1]
+    if x0 == x1:
+        return x1, x1, 0, 1
+    dx = np.diff(ux)
+    tolerance = tolerance * np.abs(x1 - x0) / dx.shape[0]
 
     dx = dx[dx > tolerance]
     udx = np.unique(dx)
@@ -71,8 +253,5 @@ def grid_size(x, tolerance=0.001):
     else:
         dx = np.median(dx)
 
-    nx = np.round((x.max() - x.min()) / dx + 1)
-    x0 = x.min()
-    x1 = x.max() #x0 + nx*dx
+    nx = np.round((x1 - x0) / dx + 1)
     return x0, x1, dx, nx
-
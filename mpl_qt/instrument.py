@@ -0,0 +1,193 @@
+"""Render instrumentation of the plots: stage timings and artist counts.
+
+A frame is the sequence of stages ending with a rasterization:
+
+============= ===========================================================
+stage         work
+============= ===========================================================
+``prepare``   data preparation (LOD levels, mesh windows, displacements)
+``artists``   creation and update of the matplotlib artists
+``rasterize`` Agg rasterization of the figure (canvas draw)
+============= ===========================================================
+
+Stage times are exclusive: a stage entered within another one pauses the
+outer stage, so :func:`timed` can decorate both a method and the helpers it
+calls. Completed frames are kept in rolling windows (histograms,
+percentiles) and optionally written as JSON lines.
+"""
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import json
+import time
+import timeit
+import itertools
+import threading
+import functools
+import contextlib
+import collections
+
+import numpy as np
+
+
+#: Stages of a frame.
+STAGES = ("prepare", "artists", "rasterize")
+
+
+class RenderStats(object):
+    """Rolling statistics of the frames of one plot.
+
+    Parameters
+    ----------
+    name : str
+        Name of the plot in the records (eg. tab name).
+    size : int
+        Number of frames kept.
+    log : file, optional
+        Stream the frame records are written to (JSON lines).
+
+    Attributes
+    ----------
+    history : dict
+        Rolling windows (collections.deque) of the times (s) per stage and
+        ``"total"``, and of the counts ``"artist_count"`` and
+        ``"vertex_count"``.
+    last : dict or None
+        Record of the last frame.
+    """
+
+    def __init__(self, name, size=256, log=None):
+        self.name = name
+        self.log = log
+        self.history = {key: collections.deque(maxlen=size) for key in
+                        STAGES + ("total", "artist_count", "vertex_count")}
+        self.last = None
+        self._frame = collections.defaultdict(float)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        """Context accumulating its (exclusive) time to stage."""
+        # per thread: [stage, start of the running interval]
+        stack = self._local.__dict__.setdefault("stack", [])
+        now = timeit.default_timer()
+        if stack:
+            self._add(stack[-1][0], now - stack[-1][1])
+        entry = [stage, now]
+        stack.append(entry)
+        try:
+            yield
+        finally:
+            now = timeit.default_timer()
+            stack.pop()
+            self._add(stage, now - entry[1])
+            if stack:
+                stack[-1][1] = now
+
+    def end_frame(self, artist_count=0, vertex_count=0):
+        """Complete the frame (after the rasterization).
+
+        Returns
+        -------
+        dict
+            The frame record: time (epoch), plot name, times (s) per stage
+            and total, artist and vertex counts.
+        """
+        with self._lock:
+            frame, self._frame = self._frame, collections.defaultdict(float)
+            record = dict((stage, frame[stage]) for stage in STAGES)
+            record.update(time=time.time(), name=self.name,
+                          total=sum(frame.values()),
+                          artist_count=artist_count,
+                          vertex_count=vertex_count)
+            for key, window in self.history.items():
+                window.append(record[key])
+            self.last = record
+        if self.log is not None:
+            self.log.write(json.dumps(record, sort_keys=True) + "\n")
+            self.log.flush()
+        return record
+
+    def histogram(self, key, bins=10):
+        """Histogram of the rolling window of key (see numpy.histogram)."""
+        return np.histogram(np.asarray(self.history[key]), bins=bins)
+
+    def percentile(self, key, q):
+        """Percentile q of the rolling window of key (nan if empty)."""
+        values = np.asarray(self.history[key])
+        return np.percentile(values, q) if len(values) else np.nan
+
+    def summary(self):
+        """Return count, mean, median, 95th percentile and maximum of the
+        stage times (s) per stage and total.
+
+        Returns
+        -------
+        dict
+        """
+        summary = {}
+        for key in STAGES + ("total",):
+            values = np.asarray(self.history[key])
+            if not len(values):
+                continue
+            summary[key] = dict(count=len(values), mean=values.mean(),
+                                p50=np.percentile(values, 50),
+                                p95=np.percentile(values, 95),
+                                max=values.max())
+        return summary
+
+    def format(self):
+        """Return a text table of the last frame and the rolling median and
+        95th percentile (ms)."""
+        if self.last is None:
+            return self.name
+        lines = ["{}: {} artists, {} vertices".format(
+            self.name, self.last["artist_count"], self.last["vertex_count"])]
+        lines.append("{:10s}{:>8s}{:>8s}{:>8s}".format("[ms]", "last", "p50",
+                                                        "p95"))
+        for key in STAGES + ("total",):
+            lines.append("{:10s}{:8.1f}{:8.1f}{:8.1f}".format(
+                key, 1e3 * self.last[key], 1e3 * self.percentile(key, 50),
+                1e3 * self.percentile(key, 95)))
+        return "\n".join(lines)
+
+    def _add(self, stage, seconds):
+        with self._lock:
+            self._frame[stage] += seconds
+
+
+def timed(stage):
+    """Decorate a plot widget method to time it as stage of ``self.stats``
+    (a :class:`RenderStats`)."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.stats.stage(stage):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_artists(figure):
+    """Return the number of visible artists and their vertices of the axes
+    of figure.
+
+    Returns
+    -------
+    artists, vertices : int
+    """
+    artists = vertices = 0
+    for ax in figure.axes:
+        for artist in itertools.chain(ax.collections, ax.patches, ax.lines):
+            if not artist.get_visible():
+                continue
+            artists += 1
+            if hasattr(artist, "get_paths"):
+                paths = artist.get_paths()
+            else:
+                paths = [artist.get_path()]
+            vertices += sum(len(path.vertices) for path in paths)
+    return artists, vertices
@@ -0,0 +1,109 @@
+"""Load :class:`mpl_qt.model.QuiverModel` from files without copying the data.
+
+Supported formats:
+
+============================= ===============================================
+extension                     content
+============================= ===============================================
+``.npy``                      array with shape = (n, 4): x, y, xvalue, yvalue
+``.npy``, ``.npy``            arrays with shape = (n, 2): xy and xyvalue
+``.h5``, ``.hdf5``            datasets ``xy`` and ``xyvalue`` with
+                              shape = (n, 2), requires h5py
+============================= ===============================================
+
+``.npy`` files are memory-mapped, the positions and values are views of
+the mapped file: only the pages actually accessed are read and all views
+share the one buffer. Contiguous (unchunked, uncompressed) HDF5 datasets are
+memory-mapped as well, chunked datasets are read into memory once.
+"""
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import os.path as op
+
+import numpy as np
+
+from mpl_qt.model import QuiverModel
+
+
+NPY_EXTENSIONS = (".npy",)
+HDF5_EXTENSIONS = (".h5", ".hdf5")
+
+
+def load(filename, *args, **kwargs):
+    """Load a QuiverModel from filename, the format is chosen by extension.
+
+    Further arguments are passed to :func:`load_npy` or :func:`load_hdf5`.
+
+    Returns
+    -------
+    QuiverModel
+    """
+    ext = op.splitext(filename)[1].lower()
+    if ext in NPY_EXTENSIONS:
+        return load_npy(filename, *args, **kwargs)
+    elif ext in HDF5_EXTENSIONS:
+        return load_hdf5(filename, *args, **kwargs)
+    raise ValueError("unsupported file format '{}'".format(ext))
+
+
+def load_npy(filename, xyvalue_filename=None, mmap_mode="r"):
+    """Load a QuiverModel from memory-mapped .npy files.
+
+    Parameters
+    ----------
+    filename : str
+        Array with shape = (n, 4) (x, y, xvalue, yvalue), or with
+        shape = (n, 2) (x, y) if xyvalue_filename is given.
+    xyvalue_filename : str, optional
+        Array with shape = (n, 2) (xvalue, yvalue).
+    mmap_mode : str
+        See numpy.load.
+
+    Returns
+    -------
+    QuiverModel
+    """
+    data = np.load(filename, mmap_mode=mmap_mode)
+    if xyvalue_filename is None:
+        if data.ndim != 2 or data.shape[1] != 4:
+            raise ValueError("expected array of shape (n, 4) in '{}', got "
+                             "{}".format(filename, data.shape))
+        return QuiverModel(data[:, :2], data[:, 2:])
+    xyvalue = np.load(xyvalue_filename, mmap_mode=mmap_mode)
+    return QuiverModel(data, xyvalue)
+
+
+def load_hdf5(filename, xy="xy", xyvalue="xyvalue"):
+    """Load a QuiverModel from HDF5 datasets.
+
+    Parameters
+    ----------
+    filename : str
+    xy, xyvalue : str
+        Names of the datasets with shape = (n, 2).
+
+    Returns
+    -------
+    QuiverModel
+    """
+    # imported on demand, h5py is slow to import and optional
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("loading HDF5 files requires h5py")
+    with h5py.File(filename, "r") as h5file:
+        return QuiverModel(_hdf5_array(h5file[xy]),
+                           _hdf5_array(h5file[xyvalue]))
+
+
+def _hdf5_array(dataset):
+    """Memory-map a contiguous HDF5 dataset, read others into memory."""
+    offset = dataset.id.get_offset()
+    if (dataset.chunks is None and dataset.compression is None and
+            offset is not None):
+        return np.memmap(dataset.file.filename, mode="r", dtype=dataset.dtype,
+                         offset=offset, shape=dataset.shape)
+    return dataset[...]
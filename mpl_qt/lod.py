@@ -0,0 +1,128 @@
+"""Level of detail (LOD) aggregation of dense vector fields.
+
+Level ``k`` bins the points into square cells of width ``base_step * 2**k``
+(data units). Each non-empty cell is replaced by a single arrow at the mean
+position of its points carrying their mean value. Level 0 is the original
+data. Points with non-finite positions are missing (left out of the
+extent and the cells).
+"""
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+
+import mpl_qt.grid as grid
+
+
+class QuiverLOD(object):
+    """Cached level of detail aggregations of a vector field.
+
+    Parameters
+    ----------
+    xy, xyvalue : arrays with shape = (n, 2)
+        Positions and values.
+    base_step : float, optional
+        Cell width of level 0, defaults to the mean point spacing.
+
+    Attributes
+    ----------
+    extent : (float, float, float, float)
+        (xmin, xmax, ymin, ymax) of the finite positions, zero if there
+        are none.
+    """
+
+    def __init__(self, xy, xyvalue, base_step=None):
+        self.xy = xy
+        self.xyvalue = xyvalue
+        valid = np.isfinite(xy).all(axis=1)
+        self._valid = None if valid.all() else valid
+        finite = xy[valid]
+        if finite.shape[0]:
+            self.extent = (finite[:, 0].min(), finite[:, 0].max(),
+                           finite[:, 1].min(), finite[:, 1].max())
+        else:
+            self.extent = (0.0, 0.0, 0.0, 0.0)
+        if base_step is None:
+            width = max(self.extent[1] - self.extent[0],
+                        self.extent[3] - self.extent[2])
+            base_step = width / np.sqrt(max(finite.shape[0], 1)) or 1.0
+        self.base_step = base_step
+        self._levels = {0: (xy, xyvalue)}
+
+    def is_valid(self, xy, xyvalue):
+        """Return True if the aggregations were built from xy and xyvalue."""
+        return self.xy is xy and self.xyvalue is xyvalue
+
+    def step(self, k):
+        """Cell width of level k."""
+        return self.base_step * 2**k
+
+    def level_for_view(self, xlim, ylim, width, height, cell_pixels=8):
+        """Select the finest level with cells of at least cell_pixels.
+
+        Parameters
+        ----------
+        xlim, ylim : (float, float)
+            View limits (data units).
+        width, height : float
+            View size (pixels).
+        cell_pixels : float
+            Minimum cell width (pixels).
+
+        Returns
+        -------
+        int
+        """
+        data_per_pixel = max(abs(xlim[1] - xlim[0]) / max(width, 1),
+                             abs(ylim[1] - ylim[0]) / max(height, 1))
+        size = cell_pixels * data_per_pixel
+        if size <= self.base_step:
+            return 0
+        return int(np.ceil(np.log2(size / self.base_step)))
+
+    def level(self, k):
+        """Return mean positions and values of level k.
+
+        The binning is vectorized (one bincount per component) and cached
+        per level.
+
+        Returns
+        -------
+        xy, xyvalue : arrays with shape = (m, 2)
+        """
+        if k not in self._levels:
+            step = self.step(k)
+            xy, xyvalue = self.xy, self.xyvalue
+            if self._valid is not None:
+                xy, xyvalue = xy[self._valid], xyvalue[self._valid]
+            if not xy.shape[0]:
+                self._levels[k] = xy, xyvalue
+                return xy, xyvalue
+            i = grid.grid_index(xy[:, 0], self.extent[0], step)
+            j = grid.grid_index(xy[:, 1], self.extent[2], step)
+            cell = i * (j.max() + 1) + j
+            counts = np.bincount(cell)
+            filled = counts > 0
+            counts = counts[filled]
+
+            def mean(weights):
+                return np.bincount(cell, weights=weights)[filled] / counts
+
+            self._levels[k] = (
+                np.column_stack([mean(xy[:, 0]), mean(xy[:, 1])]),
+                np.column_stack([mean(xyvalue[:, 0]), mean(xyvalue[:, 1])]))
+        return self._levels[k]
+
+    def view(self, k, xlim, ylim):
+        """Return the arrows of level k within the limits xlim, ylim.
+
+        Returns
+        -------
+        xy, xyvalue : arrays with shape = (m, 2)
+        """
+        xy, xyvalue = self.level(k)
+        inside = ((xy[:, 0] >= min(xlim)) & (xy[:, 0] <= max(xlim)) &
+                  (xy[:, 1] >= min(ylim)) & (xy[:, 1] <= max(ylim)))
+        return xy[inside], xyvalue[inside]
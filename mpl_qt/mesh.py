@@ -0,0 +1,568 @@
+"""Build matplotlib paths for meshes of grid points.
+
+The grid points of a mesh are given in an array of shape ``(nx, ny)`` per
+coordinate (see :ref:`definition_of_grid`). Each grid tile (cell) is spanned
+by four neighbouring grid points.
+
+Irregular points are meshed by the triangles of a triangulation
+(:class:`TriangleMesh`).
+"""
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import collections
+
+import numpy as np
+from matplotlib.path import Path
+
+import mpl_qt.fields as fields
+import mpl_qt.grid as grid
+
+
+#: Number of mesh windows cached by :meth:`MeshTopology.view`.
+WINDOW_CACHE_SIZE = 8
+
+#: Number of path vertices per grid tile (1x MOVETO, 3x LINETO, 1x CLOSEPOLY).
+CELL_NVERTS = 1 + 3 + 1
+
+
+def cell_index(shape, mask=None):
+    """Calculate indices of the grid tile corners in a flattened grid.
+
+    Parameters
+    ----------
+    shape : (int, int)
+        Grid shape (nx, ny).
+    mask : array of bool with shape = (nx, ny), optional
+        Missing grid points, tiles touching a missing grid point are skipped.
+
+    Returns
+    -------
+    array with shape = (ncells*(1+3+1),)
+        Indices into the flattened grid for the vertices of the mesh path
+        (see :func:`cell_codes`). The CLOSEPOLY vertex repeats the first
+        corner. Without mask ncells = (nx-1)*(ny-1).
+    """
+    nx, ny = shape
+    i = np.arange(nx * ny).reshape(nx, ny)
+    index = np.empty((nx - 1, ny - 1, CELL_NVERTS), dtype=np.intp)
+    index[..., 0] = i[:-1, :-1]  # lower left
+    index[..., 1] = i[1:, :-1]  # upper left
+    index[..., 2] = i[1:, 1:]  # upper right
+    index[..., 3] = i[:-1, 1:]  # lower right
+    index[..., 4] = i[:-1, :-1]
+    index = index.reshape(-1, CELL_NVERTS)
+    if mask is not None:
+        index = index[~mask.ravel()[index[:, :4]].any(axis=1)]
+    return index.reshape(-1)
+
+
+def cell_codes(ncells):
+    """Calculate the mesh path codes for ncells grid tiles.
+
+    Returns
+    -------
+    array with shape = (ncells*(1+3+1),)
+        Mesh path codes (1x Path.MOVETO, 3x Path.LINETO, 1x Path.CLOSEPOLY)
+    """
+    codes = np.empty(ncells * CELL_NVERTS, dtype=Path.code_type)
+    codes.fill(Path.LINETO)
+    codes[0::CELL_NVERTS] = Path.MOVETO
+    codes[CELL_NVERTS-1::CELL_NVERTS] = Path.CLOSEPOLY
+    return codes
+
+
+def mesh_lines(xy):
+    """Split grid positions into polylines along the grid rows and columns.
+
+    Every grid line is emitted once, so each interior tile edge is stored
+    and stroked once (instead of twice for the tile paths of
+    :func:`mesh_verts_codes`).
+
+    Parameters
+    ----------
+    xy : array with shape = (nx, ny, 2)
+        Grid positions, NaN for missing grid points (breaks the polylines).
+
+    Returns
+    -------
+    list of nx arrays with shape = (ny, 2) and ny arrays with shape = (nx, 2)
+        Views of xy (no copies), suitable as segments of a
+        matplotlib.collections.LineCollection.
+    """
+    return list(xy) + list(xy.swapaxes(0, 1))
+
+
+def mesh_verts_codes(x, y):
+    """Calculate mesh vertices and their path codes from grid positions.
+
+    Parameters
+    ----------
+    x, y : arrays with shape = (nx, ny)
+        Grid positions.
+
+    Returns
+    -------
+    verts : array with shape = ((nx-1)*(ny-1)*(1+3+1), 2)
+        Vertex positions for mesh path codes.
+    codes : array with shape = ((nx-1)*(ny-1)*(1+3+1),)
+        Mesh path codes (see :func:`cell_codes`).
+    """
+    index = cell_index(x.shape)
+    verts = np.empty((index.shape[0], 2))
+    verts[:, 0] = x.ravel()[index]
+    verts[:, 1] = y.ravel()[index]
+    return verts, cell_codes(index.shape[0] // CELL_NVERTS)
+
+
+class MeshLevel(object):
+    """Mesh of a grid of points, possibly decimated.
+
+    The mesh path vertices and codes of the grid tiles are built on first
+    access. The displaced mesh is derived from the reference mesh by
+    :meth:`displaced_grid` and :meth:`displaced_verts`.
+
+    Parameters
+    ----------
+    xy : array with shape = (n, 2)
+        Grid positions in arbitrary order.
+    order : array of int with shape = (nx, ny)
+        Index into xy of the point at each grid node.
+    mask : array of bool with shape = (nx, ny), optional
+        Missing grid points.
+    step : int
+        Decimation step (every step-th grid row and column).
+    ix, iy : arrays of int with shape = (nx,), (ny,), optional
+        Full resolution grid indices of the rows and columns, defaults to
+        all rows and columns.
+
+    Attributes
+    ----------
+    xy : array with shape = (n, 2)
+        Grid positions the mesh was built from.
+    step : int
+        Decimation step.
+    ix, iy : arrays of int
+        Full resolution grid indices of the rows and columns.
+    region : (float, float, float, float)
+        (xmin, xmax, ymin, ymax) covered by the mesh (data units), infinite
+        unless the mesh is a window (see :meth:`MeshTopology.view`).
+    nodes : array with shape = (nx, ny)
+        Index into xy of the point at each grid node.
+    shape : (int, int)
+        Grid shape (nx, ny).
+    mask : array of bool with shape = (nx, ny) or None
+        Missing grid points, None for a complete grid.
+    order : array with shape = (nx*ny,)
+        Index into xy of the point at each grid node (arbitrary for missing
+        grid points).
+    grid : array with shape = (nx, ny, 2)
+        Grid positions, NaN for missing grid points.
+    """
+
+    def __init__(self, xy, order, mask=None, step=1, ix=None, iy=None):
+        self.xy = xy
+        self.step = step
+        self.shape = order.shape
+        self.ix = np.arange(self.shape[0]) if ix is None else ix
+        self.iy = np.arange(self.shape[1]) if iy is None else iy
+        self.region = (-np.inf, np.inf, -np.inf, np.inf)
+        if mask is not None and not mask.any():
+            mask = None
+        self.mask = mask
+        self.nodes = order
+        self.order = order.ravel()
+        self.grid = xy[self.order].astype(float).reshape(self.shape + (2,))
+        if mask is not None:
+            self.grid[mask] = np.nan
+        self._index = None
+        self._codes = None
+        self._verts = None
+        self._xyvalue = None
+        self._gathered = {}
+
+    @property
+    def index(self):
+        """Indices into xy for the mesh path vertices (see :func:`cell_index`).
+        """
+        if self._index is None:
+            self._index = self.order[cell_index(self.shape, self.mask)]
+        return self._index
+
+    @property
+    def codes(self):
+        """Mesh path codes (see :func:`cell_codes`)."""
+        if self._codes is None:
+            self._codes = cell_codes(self.index.shape[0] // CELL_NVERTS)
+        return self._codes
+
+    @property
+    def verts(self):
+        """Reference mesh path vertices."""
+        if self._verts is None:
+            self._verts = self.xy[self.index].astype(float)
+        return self._verts
+
+    def displaced_grid(self, xyvalue, scale, out=None):
+        """Calculate the grid positions displaced by ``xyvalue * scale``.
+
+        Parameters
+        ----------
+        xyvalue : array with shape = (n, 2)
+            Displacements of the grid positions.
+        scale : float
+        out : array with shape = (nx, ny, 2), optional
+            Array to store the result in.
+
+        Returns
+        -------
+        array with shape = (nx, ny, 2)
+        """
+        dgrid = self._gather(xyvalue, "grid")
+        out = np.multiply(dgrid, scale, out=out)
+        out += self.grid
+        return out
+
+    def displaced_verts(self, xyvalue, scale, out=None):
+        """Calculate the mesh path vertices displaced by ``xyvalue * scale``.
+
+        Parameters
+        ----------
+        xyvalue : array with shape = (n, 2)
+            Displacements of the grid positions.
+        scale : float
+        out : array with shape = (nverts, 2), optional
+            Array to store the result in (eg. the vertices of an existing
+            path).
+
+        Returns
+        -------
+        array with shape = (nverts, 2)
+        """
+        dverts = self._gather(xyvalue, "verts")
+        out = np.multiply(dverts, scale, out=out)
+        out += self.verts
+        return out
+
+    def grid_values(self, xyvalue):
+        """Return xyvalue in grid order, shape = (nx, ny, 2), arbitrary at
+        missing grid points (cached like the displaced mesh)."""
+        return self._gather(xyvalue, "grid")
+
+    def field(self, name, xyvalue):
+        """Calculate a derived field of the displacements xyvalue per grid
+        tile (see :mod:`mpl_qt.fields`).
+
+        The displacement gradient and the fields are cached per xyvalue
+        array, until :meth:`values_changed`; the display scale does not
+        enter the fields.
+
+        Returns
+        -------
+        array with shape = (nx-1, ny-1)
+        """
+        dgrid = self.grid_values(xyvalue)
+        gathered = self._gathered
+        if "gradient" not in gathered:
+            gathered["gradient"] = fields.displacement_gradient(self.grid,
+                                                                dgrid)
+        cache = gathered.setdefault("fields", {})
+        if name not in cache:
+            cache[name] = fields.derived_field(name, gathered["gradient"])
+        return cache[name]
+
+    def values_changed(self):
+        """Drop the gathered values (after in-place changes of xyvalue)."""
+        self._xyvalue = None
+        self._gathered = {}
+
+    def _gather(self, xyvalue, kind):
+        """Return xyvalue in grid ("grid") or mesh vertex ("verts") order.
+
+        The values are gathered once per xyvalue array, subsequent calls
+        (eg. scale changes) reuse the result.
+        """
+        if self._xyvalue is not xyvalue:
+            self._xyvalue = xyvalue
+            self._gathered = {}
+        if kind not in self._gathered:
+            if kind == "grid":
+                values = xyvalue[self.order].reshape(self.grid.shape)
+            else:
+                values = xyvalue[self.index]
+            self._gathered[kind] = values
+        return self._gathered[kind]
+
+
+class MeshTopology(MeshLevel):
+    """Cached topology of a mesh of grid points.
+
+    Everything that only depends on the grid positions is calculated once:
+    the grid parameters, the grid node of each point and the grid positions.
+    The points are located on the grid in linear time (see
+    :func:`mpl_qt.grid.grid_nodes`), the grid may be incomplete.
+
+    The topology is the full resolution level of a pyramid of decimated
+    meshes (:attr:`levels`), level k keeps every 2**k-th grid row and column
+    (and the last ones, to cover the full extent).
+
+    Views on large grids draw a window of the pyramid level matching the
+    view (see :meth:`view`).
+
+    Parameters
+    ----------
+    xy : array with shape = (n, 2)
+        Grid positions in arbitrary order.
+
+    Attributes
+    ----------
+    xgrid, ygrid : (float, float, float, int)
+        Grid parameters (see :ref:`definition_of_grid`).
+    levels : list of MeshLevel
+        Pyramid of decimated meshes, ``levels[0]`` is the topology itself.
+    """
+
+    def __init__(self, xy):
+        self.xgrid, self.ygrid = grid.grid_sizes(xy)
+        nodes = grid.grid_nodes(xy, (self.xgrid, self.ygrid))
+        order = nodes.filled(0)
+        mask = np.ma.getmaskarray(nodes)
+        super(MeshTopology, self).__init__(xy, order, mask)
+
+        self.levels = [self]
+        step = 2
+        while step < max(self.shape):
+            ix = _decimate(self.shape[0], step)
+            iy = _decimate(self.shape[1], step)
+            sel = np.ix_(ix, iy)
+            self.levels.append(MeshLevel(xy, order[sel], mask[sel], step,
+                                         ix, iy))
+            step *= 2
+        self._windows = collections.OrderedDict()
+
+    def is_valid(self, xy):
+        """Return True if the topology was built from the positions xy."""
+        return self.xy is xy
+
+    def values_changed(self):
+        """Drop the gathered values of all levels and windows."""
+        for level in self.levels[1:] + list(self._windows.values()):
+            level.values_changed()
+        super(MeshTopology, self).values_changed()
+
+    def level_for_view(self, xlim, ylim, width, height, cell_pixels=1.0):
+        """Select the coarsest level with cells not larger than needed.
+
+        Finer levels would draw cells below cell_pixels in the view.
+
+        Parameters
+        ----------
+        xlim, ylim : (float, float)
+            View limits (data units).
+        width, height : float
+            View size (pixels).
+        cell_pixels : float
+            Minimum cell size (pixels).
+
+        Returns
+        -------
+        int
+            Index into :attr:`levels`.
+        """
+        dx = self.xgrid[2] * max(width, 1) / (abs(xlim[1] - xlim[0]) or 1)
+        dy = self.ygrid[2] * max(height, 1) / (abs(ylim[1] - ylim[0]) or 1)
+        cell = min(d for d in (dx, dy) if d > 0) if (dx or dy) else cell_pixels
+        if cell >= cell_pixels:
+            return 0
+        k = int(np.ceil(np.log2(cell_pixels / cell)))
+        return min(k, len(self.levels) - 1)
+
+    def view(self, xlim, ylim, width, height, cell_pixels=1.0, margin=0.5):
+        """Return the mesh to draw for a view.
+
+        This is the pyramid level selected by :meth:`level_for_view`,
+        restricted to the grid rows and columns within the view extended by
+        margin times the view size on each side. The last few windows are
+        cached.
+
+        Parameters
+        ----------
+        xlim, ylim : (float, float)
+            View limits (data units).
+        width, height : float
+            View size (pixels).
+        cell_pixels : float
+            Minimum cell size (pixels).
+        margin : float
+            Relative margin around the view.
+
+        Returns
+        -------
+        MeshLevel
+        """
+        k = self.level_for_view(xlim, ylim, width, height, cell_pixels)
+        level = self.levels[k]
+        dx = margin * abs(xlim[1] - xlim[0])
+        dy = margin * abs(ylim[1] - ylim[0])
+        xmin, xmax = min(xlim) - dx, max(xlim) + dx
+        ymin, ymax = min(ylim) - dy, max(ylim) + dy
+        i0, i1 = self._window_range(level.ix, self.xgrid, xmin, xmax)
+        j0, j1 = self._window_range(level.iy, self.ygrid, ymin, ymax)
+        if (i0, i1, j0, j1) == (0, level.shape[0], 0, level.shape[1]):
+            return level
+
+        key = k, i0, i1, j0, j1
+        if key not in self._windows:
+            mask = None if level.mask is None else level.mask[i0:i1, j0:j1]
+            window = MeshLevel(self.xy, level.nodes[i0:i1, j0:j1], mask,
+                               level.step, level.ix[i0:i1], level.iy[j0:j1])
+            window.region = xmin, xmax, ymin, ymax
+            self._windows[key] = window
+            while len(self._windows) > WINDOW_CACHE_SIZE:
+                self._windows.popitem(last=False)
+        return self._windows[key]
+
+    @staticmethod
+    def _window_range(index, gridsize, vmin, vmax):
+        """Range of the rows (columns) index within vmin, vmax plus one."""
+        start, end, step, num = gridsize
+        if step == 0:
+            return 0, index.shape[0]
+        i0 = np.searchsorted(index, (vmin - start) / step, side="right") - 1
+        i1 = np.searchsorted(index, (vmax - start) / step, side="left") + 1
+        return max(i0, 0), min(i1, index.shape[0])
+
+
+def is_regular_grid(xy, min_fill=0.5):
+    """Return True if the positions xy lie on a regular grid.
+
+    Every point with finite coordinates has to be located on its own grid
+    node (see :func:`mpl_qt.grid.grid_nodes`) and at least min_fill of the
+    grid nodes have to be filled.
+
+    Parameters
+    ----------
+    xy : array with shape = (n, 2)
+    min_fill : float
+
+    Returns
+    -------
+    bool
+    """
+    grids = grid.grid_sizes(xy)
+    shape = [int(g[3]) for g in grids]
+    points = np.isfinite(xy).all(axis=1).sum()
+    if min(shape) < 2 or shape[0] * shape[1] * min_fill > points:
+        return False
+    return grid.grid_nodes(xy, grids).count() == points
+
+
+class TriangleMesh(object):
+    """Mesh of the edges of a triangulation.
+
+    Each edge shared by two triangles is drawn once: the edges
+    (``triangulation.edges``) are stored as a single polyline of the
+    segments separated by nan vertices, suitable as one segment of a
+    matplotlib.collections.LineCollection. The displaced mesh reuses the
+    connectivity, a scale change only moves the vertices.
+
+    Parameters
+    ----------
+    xy : array with shape = (n, 2)
+        Positions.
+    triangulation : matplotlib.tri.Triangulation
+        Triangulation of xy.
+
+    Attributes
+    ----------
+    edges : array of int with shape = (nedges, 2)
+        Indices into xy of the edge ends.
+    verts : array with shape = (3*nedges, 2)
+        Reference polyline (start, end, nan per edge).
+    """
+
+    def __init__(self, xy, triangulation):
+        self.xy = xy
+        self.triangulation = triangulation
+        self.edges = triangulation.edges
+        verts = np.full((len(self.edges), 3, 2), np.nan)
+        verts[:, :2] = xy[self.edges]
+        self.verts = verts.reshape(-1, 2)
+        self._xyvalue = None
+        self._gathered = {}
+
+    def is_valid(self, xy):
+        """Return True if the mesh was built from the positions xy."""
+        return self.xy is xy
+
+    def displaced_positions(self, xyvalue, scale):
+        """Return the positions displaced by ``xyvalue * scale``."""
+        return self.xy + scale * xyvalue
+
+    def displaced_verts(self, xyvalue, scale, out=None):
+        """Calculate the polyline displaced by ``xyvalue * scale``.
+
+        The values of the edge ends are gathered once per xyvalue array.
+
+        Parameters
+        ----------
+        xyvalue : array with shape = (n, 2)
+        scale : float
+        out : array with shape = (3*nedges, 2), optional
+            Array to store the result in (eg. the vertices of the displaced
+            polyline), its nan vertices are kept.
+
+        Returns
+        -------
+        array with shape = (3*nedges, 2)
+        """
+        gathered = self._gather(xyvalue)
+        if "edges" not in gathered:
+            gathered["edges"] = xyvalue[self.edges]
+        if out is None:
+            out = self.verts.copy()
+        ends = out.reshape(-1, 3, 2)[:, :2]
+        np.multiply(gathered["edges"], scale, out=ends)
+        ends += self.verts.reshape(-1, 3, 2)[:, :2]
+        return out
+
+    def field(self, name, xyvalue):
+        """Calculate a derived field of the displacements xyvalue per
+        triangle (see :mod:`mpl_qt.fields`).
+
+        The displacement gradient and the fields are cached per xyvalue
+        array, until :meth:`values_changed`.
+
+        Returns
+        -------
+        array with shape = (ntri,)
+        """
+        gathered = self._gather(xyvalue)
+        if "gradient" not in gathered:
+            gathered["gradient"] = fields.triangle_gradient(
+                self.xy, self.triangulation.triangles, xyvalue)
+        cache = gathered.setdefault("fields", {})
+        if name not in cache:
+            cache[name] = fields.derived_field(name, gathered["gradient"])
+        return cache[name]
+
+    def values_changed(self):
+        """Drop the gathered values (after in-place changes of xyvalue)."""
+        self._xyvalue = None
+        self._gathered = {}
+
+    def _gather(self, xyvalue):
+        if self._xyvalue is not xyvalue:
+            self._xyvalue = xyvalue
+            self._gathered = {}
+        return self._gathered
+
+
+def _decimate(num, step):
+    """Indices of every step-th of num grid points, including the last."""
+    index = np.arange(0, num, step)
+    if index[-1] != num - 1:
+        index = np.append(index, num - 1)
+    return index
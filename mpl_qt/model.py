@@ -0,0 +1,264 @@
+"""Data models shared by the views."""
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import threading
+import collections
+
+import numpy as np
+
+import mpl_qt.affine as affine
+import mpl_qt.spatial as spatial
+
+
+#: Description of a model change passed to the observers.
+#:
+#: version : int
+#:     Model version after the change.
+#: positions, values : bool
+#:     Whether the positions and/or the values changed.
+#: start, stop : int or None
+#:     Range of changed rows (stop None: to the end).
+ModelChange = collections.namedtuple(
+    "ModelChange", ["version", "positions", "values", "start", "stop"])
+
+
+class QuiverModel(object):
+    """Observable vector field: values at positions.
+
+    The arrays are used as given (no copies), they may be memory-mapped
+    (see :mod:`mpl_qt.loader`).
+
+    Every change increments :attr:`version` and is reported to the
+    subscribed observers as :data:`ModelChange`, so views can restrict
+    their work to what changed.
+
+    Attributes
+    ----------
+    xy : array with shape = (n, 2)
+        Positions. Assigning a new array notifies the observers.
+    xyvalue : array with shape = (n, 2)
+        Values (eg. displacements) at the positions. Assigning a new array
+        notifies the observers.
+    version : int
+        Incremented on every change.
+    positions_version : int
+        Version of the last change of the positions.
+    """
+
+    def __init__(self, pxy, vxy):
+        self._xy = pxy
+        self._xyvalue = vxy
+        self.version = 0
+        self.positions_version = 0
+        self._observers = []
+        self._rms = {}
+        self._index = None
+        self._affine_fit = None
+        self._residuals = None
+        self._triangulation = None
+
+    @property
+    def xy(self):
+        return self._xy
+
+    @xy.setter
+    def xy(self, xy):
+        self._xy = xy
+        self.changed(positions=True)
+
+    @property
+    def xyvalue(self):
+        return self._xyvalue
+
+    @xyvalue.setter
+    def xyvalue(self, xyvalue):
+        self._xyvalue = xyvalue
+        self.changed(values=True)
+
+    def value_rms(self, residual=False):
+        """Return the RMS of the magnitudes of the non-zero values (eg. the
+        quiver key length), cached per version.
+
+        Parameters
+        ----------
+        residual : bool
+            RMS of the non-affine residual (see :meth:`residual_values`).
+        """
+        rms = self._rms.get(residual)
+        if rms is None or rms[0] != self.version:
+            values = self.residual_values() if residual else self._xyvalue
+            squares = np.sum(np.square(values), axis=1)
+            rms = self.version, np.sqrt(np.mean(squares[squares != 0]))
+            self._rms[residual] = rms
+        return rms[1]
+
+    def affine_fit(self):
+        """Return the affine fit of the positions
+        (:class:`mpl_qt.affine.AffineFit`), cached until the positions
+        change."""
+        if (self._affine_fit is None or
+                self._affine_fit[0] != self.positions_version):
+            self._affine_fit = (self.positions_version,
+                                affine.AffineFit(self._xy))
+        return self._affine_fit[1]
+
+    def residual_values(self):
+        """Return the values minus their least squares affine part (the
+        non-affine residual), cached per version."""
+        if self._residuals is None or self._residuals[0] != self.version:
+            _, residuals = self.affine_fit().fit(self._xyvalue,
+                                                 displacements=True)
+            self._residuals = self.version, residuals
+        return self._residuals[1]
+
+    def point_index(self):
+        """Return the spatial index of the positions
+        (:class:`mpl_qt.spatial.PointIndex`), cached until the positions
+        change."""
+        if self._index is None or self._index[0] != self.positions_version:
+            self._index = (self.positions_version,
+                           spatial.PointIndex(self._xy))
+        return self._index[1]
+
+    def triangulation(self):
+        """Return the Delaunay triangulation of the positions
+        (matplotlib.tri.Triangulation), cached until the positions change.
+
+        Positions with non-finite coordinates are no triangle corners.
+        """
+        if (self._triangulation is None or
+                self._triangulation[0] != self.positions_version):
+            import matplotlib.tri as mtri
+            x, y = self._xy[:, 0], self._xy[:, 1]
+            valid = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+            if len(valid) == len(x):
+                triangulation = mtri.Triangulation(x, y)
+            else:
+                delaunay = mtri.Triangulation(x[valid], y[valid])
+                triangulation = mtri.Triangulation(
+                    x, y, valid[delaunay.triangles])
+            self._triangulation = self.positions_version, triangulation
+        return self._triangulation[1]
+
+    def subscribe(self, callback):
+        """Call callback(model, change) on every change."""
+        self._observers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._observers.remove(callback)
+
+    def update(self, xy=None, xyvalue=None, start=0):
+        """Overwrite rows of the positions and/or values in place.
+
+        Parameters
+        ----------
+        xy, xyvalue : arrays with shape = (m, 2), optional
+            New positions and values of the rows start to start + m.
+        start : int
+        """
+        stop = start
+        if xy is not None:
+            stop = start + len(xy)
+            self._xy[start:stop] = xy
+        if xyvalue is not None:
+            stop = start + len(xyvalue)
+            self._xyvalue[start:stop] = xyvalue
+        self.changed(positions=xy is not None, values=xyvalue is not None,
+                     start=start, stop=stop)
+
+    def changed(self, positions=False, values=False, start=0, stop=None):
+        """Notify the observers of a change of the rows start to stop.
+
+        To be called after in-place modifications of xy or xyvalue.
+        """
+        self.version += 1
+        if positions:
+            self.positions_version = self.version
+        change = ModelChange(self.version, positions, values, start, stop)
+        for callback in list(self._observers):
+            callback(self, change)
+
+
+class StreamModel(QuiverModel):
+    """Live values on fixed positions, keeping the latest frames.
+
+    Frames are written by :meth:`push` (from any thread) into a
+    preallocated ring buffer of nframes. :meth:`publish` (called by the
+    views' timer at their frame rate, see
+    :class:`mpl_qt.ui.scheduler.StreamTimer`) copies the latest frame into
+    :attr:`xyvalue` and notifies the observers once. Frames pushed in between
+    are dropped, not queued.
+
+    The RMS of the non-zero values (:meth:`value_rms`) is a running value
+    over the frames in the ring buffer, updated per pushed frame.
+
+    Parameters
+    ----------
+    pxy : array with shape = (n, 2)
+        Positions.
+    nframes : int
+        Number of frames kept.
+    dtype : numpy.dtype
+
+    Attributes
+    ----------
+    frames : array with shape = (nframes, n, 2)
+        Ring buffer, use :meth:`frame` to access it.
+    pushed, dropped : int
+        Number of pushed frames and of frames never published.
+    """
+
+    def __init__(self, pxy, nframes=16, dtype=float):
+        super(StreamModel, self).__init__(pxy, np.zeros((len(pxy), 2), dtype))
+        self.frames = np.zeros((nframes, len(pxy), 2), dtype)
+        self.pushed = 0
+        self.dropped = 0
+        self._published = 0
+        self._squares = np.zeros(nframes)
+        self._nonzero = np.zeros(nframes, dtype=int)
+        self._lock = threading.Lock()
+
+    def push(self, xyvalue):
+        """Append a frame of values (shape = (n, 2)), overwriting the oldest
+        frame."""
+        squares = np.sum(np.square(xyvalue), axis=1)
+        with self._lock:
+            slot = self.pushed % len(self.frames)
+            np.copyto(self.frames[slot], xyvalue)
+            self._squares[slot] = squares.sum()
+            self._nonzero[slot] = np.count_nonzero(squares)
+            self.pushed += 1
+
+    def frame(self, age=0):
+        """Return the frame pushed age frames before the latest (a view of
+        the ring buffer)."""
+        if not 0 <= age < min(self.pushed, len(self.frames)):
+            raise IndexError("frame {} not available".format(age))
+        return self.frames[(self.pushed - 1 - age) % len(self.frames)]
+
+    def publish(self):
+        """Show the latest frame, if a new one was pushed.
+
+        Returns
+        -------
+        bool
+            True if the observers were notified.
+        """
+        with self._lock:
+            if self.pushed == self._published:
+                return False
+            np.copyto(self._xyvalue, self.frame())
+            self.dropped += self.pushed - self._published - 1
+            self._published = self.pushed
+        self.changed(values=True)
+        return True
+
+    def value_rms(self, residual=False):
+        if residual:
+            return super(StreamModel, self).value_rms(residual)
+        with self._lock:
+            count = self._nonzero.sum()
+            return np.sqrt(self._squares.sum() / count) if count else np.nan
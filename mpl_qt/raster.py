@@ -0,0 +1,113 @@
+"""Image pyramids of scalar fields on regular grids.
+
+Level ``k`` of the pyramid averages blocks of ``2**k x 2**k`` grid cells
+(missing cells, nan, are ignored). A view draws the window of the level with
+cells of about a pixel, so its cost depends on the screen size, not on the
+size of the grid.
+"""
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+
+
+class ImagePyramid(object):
+    """Cached block mean levels of an image.
+
+    Parameters
+    ----------
+    image : array with shape = (nx, ny)
+        Values of the cells of a regular grid, nan for missing cells. The
+        first axis is x.
+    extent : (float, float, float, float)
+        (xmin, xmax, ymin, ymax) covered by the cells (outer cell edges).
+    """
+
+    def __init__(self, image, extent):
+        self.extent = extent
+        self._levels = [np.asarray(image, dtype=float)]
+
+    @property
+    def shape(self):
+        return self._levels[0].shape
+
+    def cell_size(self, k):
+        """Cell width and height of level k (data units)."""
+        nx, ny = self.shape
+        x0, x1, y0, y1 = self.extent
+        return 2**k * (x1 - x0) / nx, 2**k * (y1 - y0) / ny
+
+    def level_for_view(self, xlim, ylim, width, height, cell_pixels=1.0):
+        """Select the finest level with cells of at least cell_pixels.
+
+        Parameters
+        ----------
+        xlim, ylim : (float, float)
+            View limits (data units).
+        width, height : float
+            View size (pixels).
+        cell_pixels : float
+            Minimum cell size (pixels).
+
+        Returns
+        -------
+        int
+        """
+        dx, dy = self.cell_size(0)
+        cell = min(dx * max(width, 1) / (abs(xlim[1] - xlim[0]) or 1),
+                   dy * max(height, 1) / (abs(ylim[1] - ylim[0]) or 1))
+        if cell >= cell_pixels or cell <= 0:
+            return 0
+        k = int(np.ceil(np.log2(cell_pixels / cell)))
+        return min(k, int(np.ceil(np.log2(max(self.shape)))))
+
+    def level(self, k):
+        """Return the image of level k, shape = ceil(shape / 2**k).
+
+        The levels are built on first access from the next finer level.
+        """
+        while len(self._levels) <= k:
+            self._levels.append(_block_mean(self._levels[-1]))
+        return self._levels[k]
+
+    def view(self, k, xlim, ylim):
+        """Return the window of level k covering the limits xlim, ylim.
+
+        Returns
+        -------
+        image : array
+            View of the cells of the window.
+        extent : (float, float, float, float)
+            Outer cell edges of the window.
+        """
+        image = self.level(k)
+        x0, _, y0, _ = self.extent
+        dx, dy = self.cell_size(k)
+        i0, i1 = _window(image.shape[0], x0, dx, xlim)
+        j0, j1 = _window(image.shape[1], y0, dy, ylim)
+        return image[i0:i1, j0:j1], (x0 + i0 * dx, x0 + i1 * dx,
+                                     y0 + j0 * dy, y0 + j1 * dy)
+
+
+def _block_mean(image):
+    """Mean of the finite values of 2x2 blocks (nan for empty blocks)."""
+    nx, ny = image.shape
+    padded = np.full((nx + nx % 2, ny + ny % 2), np.nan)
+    padded[:nx, :ny] = image
+    valid = np.isfinite(padded)
+    blocks = padded.shape[0] // 2, 2, padded.shape[1] // 2, 2
+    total = np.where(valid, padded, 0.0).reshape(blocks).sum(axis=(1, 3))
+    count = valid.reshape(blocks).sum(axis=(1, 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / count
+
+
+def _window(num, start, step, limits):
+    """Range of the cells (of width step from start) within limits."""
+    if step <= 0:
+        return 0, num
+    i0 = int(np.floor((min(limits) - start) / step))
+    i1 = int(np.ceil((max(limits) - start) / step))
+    return min(max(i0, 0), num), min(max(i1, 0), num)
@@ -0,0 +1,868 @@
+"""Qt-free rendering core of the quiver and mesh plots.
+
+The renderers create and update the matplotlib artists of a model on given
+axes, independent of the GUI toolkit and the canvas: quiver plot, mesh and
+heatmap. The plot widgets of
+:mod:`mpl_qt.ui.plot` use them on their Qt canvas, :mod:`mpl_qt.batch`
+renders files headless on the Agg backend.
+"""
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import logging
+
+import numpy as np
+import matplotlib as mpl
+import matplotlib.collections
+import matplotlib.patches
+import matplotlib.path
+import matplotlib.tri
+
+import mpl_qt.fields as fields
+import mpl_qt.instrument as instrument
+import mpl_qt.lod as lod
+import mpl_qt.mesh as mesh
+import mpl_qt.raster as raster
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def setup_axes(fig):
+    """Add and return the axes of a plot to figure fig."""
+    ax = fig.add_subplot(111)
+    ax.set_aspect('equal')
+    ax.grid(True)
+    return ax
+
+
+class Renderer(object):
+    """Base class of the renderers.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+    model : mpl_qt.model.QuiverModel
+    stats : mpl_qt.instrument.RenderStats, optional
+        Records the prepare and artists stages.
+
+    Attributes
+    ----------
+    unit : str
+        Axis label.
+    residual : bool
+        Show the non-affine residual of the values
+        (:meth:`mpl_qt.model.QuiverModel.residual_values`) instead of the
+        values.
+    """
+
+    def __init__(self, ax, model, stats=None):
+        self.ax = ax
+        self.model = model
+        self.stats = stats or instrument.RenderStats(type(self).__name__)
+        self.unit = ""
+        self.residual = False
+
+    def draw(self):
+        """Clear the axes and create the artists."""
+        self.ax.clear()
+
+    def update(self):
+        """Update the existing artists (eg. after a scale change), the
+        default is :meth:`draw`."""
+        self.draw()
+
+    def needs_draw(self):
+        """Return True if :meth:`update` has no artists to update and does a
+        full :meth:`draw`."""
+        return True
+
+    def dynamic_artists(self):
+        """Return the artists changed by :meth:`update` (eg. for blitting)."""
+        return []
+
+    def overlay_artists(self):
+        """Return the artists changing independently of the data (eg. a
+        key), always blitted by the plot widgets."""
+        return []
+
+    def model_changed(self, change):
+        """Drop the caches invalidated by a model change.
+
+        Parameters
+        ----------
+        change : mpl_qt.model.ModelChange
+        """
+        pass
+
+    def view_changed(self):
+        """Adapt the artists to the axes limits (eg. after pan/zoom).
+
+        Returns
+        -------
+        bool
+            True if the artists changed.
+        """
+        return False
+
+    def values(self):
+        """Return the values shown (see :attr:`residual`)."""
+        if self.residual:
+            with self.stats.stage("prepare"):
+                return self.model.residual_values()
+        return self.model.xyvalue
+
+    def view_pixels(self):
+        """Return width and height of the axes box in pixels.
+
+        Uses the original (not aspect adjusted) axes box, the adjusted box
+        is only up to date after a draw.
+        """
+        bbox = self.ax.get_position(original=True)
+        fig_bbox = self.ax.figure.bbox
+        return bbox.width * fig_bbox.width, bbox.height * fig_bbox.height
+
+    def _set_labels(self):
+        self.ax.set_xlabel(self.unit)
+        self.ax.set_ylabel(self.unit)
+
+
+class QuiverRenderer(Renderer):
+    """Quiver plot of the values at the positions with a key arrow.
+
+    Attributes
+    ----------
+    scale : float
+        Arrow scale (see matplotlib.axes.Axes.quiver).
+    key_length : float
+        Length of the key arrow, defaults to the RMS of the non-zero values
+        shown (:meth:`mpl_qt.model.QuiverModel.value_rms`, following the
+        model).
+    lod : bool
+        Draw one mean arrow per screen cell instead of every arrow (level of
+        detail aggregation, see :mod:`mpl_qt.lod`).
+    quiver : matplotlib.quiver.Quiver or None
+    quiverkey : matplotlib.quiver.QuiverKey or None
+    """
+
+    #: Number of arrows above which the level of detail aggregation is
+    #: enabled by default.
+    LOD_MIN_ARROWS = 50000
+
+    def __init__(self, ax, model, stats=None):
+        super(QuiverRenderer, self).__init__(ax, model, stats)
+        self._key_length = None
+        self.scale = 1.0
+        self.lod = self.model.xy.shape[0] > self.LOD_MIN_ARROWS
+        self.quiver = None
+        self.quiverkey = None
+        self._lod_cache = None
+        self._lod_region = None
+
+    @property
+    def key_length(self):
+        if self._key_length is None:
+            return self.model.value_rms(self.residual)
+        return self._key_length
+
+    @key_length.setter
+    def key_length(self, length):
+        self._key_length = length
+
+    @property
+    def lod_cache(self):
+        """Cached :class:`mpl_qt.lod.QuiverLOD` of the model data."""
+        values = self.values()
+        if (self._lod_cache is None or
+                not self._lod_cache.is_valid(self.model.xy, values)):
+            LOGGER.debug("build level of detail cache")
+            with self.stats.stage("prepare"):
+                self._lod_cache = lod.QuiverLOD(self.model.xy, values)
+        return self._lod_cache
+
+    @instrument.timed("artists")
+    def draw(self):
+        self.ax.clear()
+        self.quiver = None
+        self.quiverkey = None
+
+        if self.lod:
+            x0, x1, y0, y1 = self.lod_cache.extent
+            self.ax.set_xlim(x0, x1)
+            self.ax.set_ylim(y0, y1)
+        self._add_quiver(*self._quiver_data())
+        self._set_labels()
+
+    @instrument.timed("artists")
+    def update(self):
+        """Update scale, arrow data and key of the existing quiver artists.
+
+        Avoids clearing the axes and rebuilding the Quiver and QuiverKey
+        artists (expensive for large numbers of arrows).
+        """
+        if self.needs_draw():
+            self.draw()
+            return
+
+        xy, xyvalue = self._quiver_data()
+        if xy.shape[0] != self.quiver.N:
+            self._add_quiver(xy, xyvalue)
+        else:
+            self.quiver.scale = self.scale
+            self.quiver.set_UVC(xyvalue[:, 0], xyvalue[:, 1])
+            self.update_key()
+        self._set_labels()
+
+    def update_key(self):
+        """Update length and label of the existing key arrow."""
+        self.quiverkey.U = self.key_length
+        self.quiverkey.label = self._key_label()
+        # the key arrow is rebuilt from U by QuiverKey.draw
+        self.quiverkey.text.set_text(self.quiverkey.label)
+
+    def needs_draw(self):
+        return self.quiver is None
+
+    def dynamic_artists(self):
+        return [self.quiver, self.quiverkey] if self.quiver else []
+
+    def overlay_artists(self):
+        return [self.quiverkey] if self.quiverkey else []
+
+    def model_changed(self, change):
+        self._lod_cache = None
+
+    @instrument.timed("artists")
+    def view_changed(self):
+        """Switch the level of detail aggregation to the current view."""
+        if self._lod_region is None or self.quiver is None:
+            return False
+        level, xlim, ylim = self._lod_region
+        xview, yview = self.ax.get_xlim(), self.ax.get_ylim()
+        if (self._lod_level(xview, yview) == level and
+                xlim[0] <= min(xview) and max(xview) <= xlim[1] and
+                ylim[0] <= min(yview) and max(yview) <= ylim[1]):
+            return False
+        LOGGER.debug("view_changed")
+        self._add_quiver(*self._quiver_data())
+        return True
+
+    def _lod_level(self, xlim, ylim):
+        return self.lod_cache.level_for_view(xlim, ylim, *self.view_pixels())
+
+    @instrument.timed("prepare")
+    def _quiver_data(self):
+        """Return positions and values of the arrows to draw.
+
+        With level of detail aggregation these are the mean arrows of the
+        level matching the current view, restricted to a region extending
+        the view by half its size on each side (small pans need no update).
+        """
+        if not self.lod:
+            self._lod_region = None
+            return self.model.xy, self.values()
+
+        xview, yview = self.ax.get_xlim(), self.ax.get_ylim()
+        level = self._lod_level(xview, yview)
+        dx = 0.5 * abs(xview[1] - xview[0])
+        dy = 0.5 * abs(yview[1] - yview[0])
+        xlim = min(xview) - dx, max(xview) + dx
+        ylim = min(yview) - dy, max(yview) + dy
+        self._lod_region = level, xlim, ylim
+        return self.lod_cache.view(level, xlim, ylim)
+
+    def _add_quiver(self, xy, xyvalue):
+        """Replace the Quiver and QuiverKey artists."""
+        if self.quiver is not None:
+            self.quiverkey.remove()
+            self.quiver.remove()
+
+        self.quiver = self.ax.quiver(xy[:, 0], xy[:, 1],
+                                     xyvalue[:, 0], xyvalue[:, 1],
+                                     units="xy",
+                                     scale=self.scale)
+
+        self.quiverkey = self.ax.quiverkey(self.quiver, 1.05, 1.05,
+                                           U=self.key_length,
+                                           coordinates="axes",
+                                           label=self._key_label(),
+                                           linewidths=(1,),
+                                           edgecolors=('k'),
+                                           color="r",
+                                           labelpos="S")
+
+    def _key_label(self):
+        return "{:2.3e} {}".format(self.key_length, self.unit)
+
+
+class MeshRenderer(Renderer):
+    """Reference mesh of the grid positions and mesh displaced by the
+    scaled values.
+
+    Positions which are no regular grid (see
+    :func:`mpl_qt.mesh.is_regular_grid`) are always meshed by their
+    triangulation.
+
+    Attributes
+    ----------
+    scale : float
+        Displacement scale.
+    mesh_style : str
+        One of :attr:`MESH_STYLES`.
+    field : str or None
+        Derived field (one of :data:`mpl_qt.fields.FIELDS`) the cells of
+        the displaced mesh are colored by, None for its outline.
+    mesh, mesh2 : matplotlib.artist.Artist or None
+        Reference and displaced mesh.
+    colorbar : matplotlib.colorbar.Colorbar or None
+        Colorbar of the field.
+    """
+
+    #: Available mesh styles: "lines" draws every grid row and column once as
+    #: a polyline, "cells" draws a closed path per grid tile, "triangles"
+    #: draws every edge of the Delaunay triangulation once.
+    MESH_STYLES = ("lines", "cells", "triangles")
+
+    def __init__(self, ax, model, stats=None):
+        super(MeshRenderer, self).__init__(ax, model, stats)
+        self.scale = 1.0
+        self.mesh_style = "lines"
+        self.field = None
+        self.mesh = None
+        self.mesh2 = None
+        self.colorbar = None
+        self._topology = None
+        self._regular = None
+        self._triangles = None
+        self._xy2 = None
+        self._level = None
+        self._extent = None
+        self._drawn_topology = None
+
+    @property
+    def triangulated(self):
+        """True if the mesh is drawn as triangles (mesh style "triangles"
+        or irregular positions)."""
+        if self.mesh_style == "triangles":
+            return True
+        if self._regular is None or self._regular[0] is not self.model.xy:
+            with self.stats.stage("prepare"):
+                self._regular = (self.model.xy,
+                                 mesh.is_regular_grid(self.model.xy))
+        return not self._regular[1]
+
+    @property
+    def triangles(self):
+        """Cached :class:`mpl_qt.mesh.TriangleMesh` of the model positions.
+
+        Rebuilt only if the model positions (``model.xy``) change.
+        """
+        if (self._triangles is None or
+                not self._triangles.is_valid(self.model.xy)):
+            LOGGER.debug("build triangles")
+            with self.stats.stage("prepare"):
+                self._triangles = mesh.TriangleMesh(
+                    self.model.xy, self.model.triangulation())
+        return self._triangles
+
+    @property
+    def topology(self):
+        """Cached :class:`mpl_qt.mesh.MeshTopology` of the model positions.
+
+        Rebuilt only if the model positions (``model.xy``) change.
+        """
+        if self._topology is None or not self._topology.is_valid(self.model.xy):
+            LOGGER.debug("build topology")
+            with self.stats.stage("prepare"):
+                self._topology = mesh.MeshTopology(self.model.xy)
+        return self._topology
+
+    @instrument.timed("artists")
+    def draw(self):
+        self.ax.clear()
+        self.mesh = None
+        self.mesh2 = None
+        self.colorbar = None
+
+        if self.triangulated:
+            triangles = self.triangles
+            self._drawn_topology = triangles
+            xy = triangles.xy[np.isfinite(triangles.xy).all(axis=1)]
+            self._extent = (xy[:, 0].min(), xy[:, 0].max(),
+                            xy[:, 1].min(), xy[:, 1].max())
+            self._add_triangle_meshes(triangles)
+        else:
+            topology = self.topology
+            self._drawn_topology = topology
+            # the level is chosen for the full extent shown after _set_limits
+            x0, x1 = topology.xgrid[:2]
+            y0, y1 = topology.ygrid[:2]
+            self._extent = x0, x1, y0, y1
+            self._add_meshes(self._mesh_level((x0, x1), (y0, y1)))
+
+        self._set_limits()
+        self._set_labels()
+
+    @instrument.timed("artists")
+    def update(self):
+        """Move the vertices of the displaced mesh in place.
+
+        The grid topology (or triangulation) and the reference mesh are
+        reused, a scale change only recomputes the displaced vertices. The
+        field colors and the colorbar are updated in place as well.
+        """
+        if self.needs_draw():
+            self.draw()
+            return
+
+        if self._drawn_topology is self._triangles:
+            if self.field is not None:
+                self._update_field_triangles(self._triangles)
+            else:
+                with self.stats.stage("prepare"):
+                    self._triangles.displaced_verts(self.values(), self.scale,
+                                                    out=self._xy2)
+                self.mesh2.stale = True
+        elif self.field is not None:
+            self._update_field_mesh(self._level)
+        elif self.mesh_style == "lines":
+            with self.stats.stage("prepare"):
+                self._level.displaced_grid(self.values(), self.scale,
+                                           out=self._xy2)
+            self.mesh2.set_segments(mesh.mesh_lines(self._xy2))
+        else:
+            with self.stats.stage("prepare"):
+                self._level.displaced_verts(self.values(), self.scale,
+                                            out=self._xy2)
+
+        self._set_limits()
+        self._set_labels()
+
+    def needs_draw(self):
+        if self.mesh2 is None:
+            return True
+        if self.triangulated:
+            return self._drawn_topology is not self.triangles
+        return self._drawn_topology is not self.topology
+
+    def dynamic_artists(self):
+        if self.mesh2 is None:
+            return []
+        if self.colorbar is not None:
+            return [self.mesh2, self.colorbar.ax]
+        return [self.mesh2]
+
+    def model_changed(self, change):
+        """Drop the topology if the positions changed, else only the cached
+        values."""
+        if change.positions:
+            self._topology = None
+            self._regular = None
+            self._triangles = None
+        else:
+            if self._topology is not None:
+                self._topology.values_changed()
+            if self._triangles is not None:
+                self._triangles.values_changed()
+
+    @instrument.timed("artists")
+    def view_changed(self):
+        """Switch to the pyramid level (window) matching the current view."""
+        if self.mesh2 is None or self._drawn_topology is self._triangles:
+            return False
+        xlim, ylim = self.ax.get_xlim(), self.ax.get_ylim()
+        topology = self.topology
+        k = topology.level_for_view(xlim, ylim, *self.view_pixels())
+        xmin, xmax, ymin, ymax = self._level.region
+        if (topology.levels[k].step == self._level.step and
+                xmin <= min(xlim) and max(xlim) <= xmax and
+                ymin <= min(ylim) and max(ylim) <= ymax):
+            return False
+        LOGGER.debug("view_changed: level %d", k)
+        self._add_meshes(self._mesh_level(xlim, ylim))
+        return True
+
+    @instrument.timed("prepare")
+    def _mesh_level(self, xlim, ylim):
+        """Return the pyramid level (window) with cells of about a pixel in
+        the view (see :meth:`mpl_qt.mesh.MeshTopology.view`)."""
+        return self.topology.view(xlim, ylim, *self.view_pixels())
+
+    def _add_meshes(self, level):
+        """Replace the reference and displaced mesh artists."""
+        if self.mesh is not None:
+            self.mesh.remove()
+            self._remove_displaced_mesh()
+
+        self._level = level
+        if self.mesh_style == "lines":
+            self.mesh = self._add_mesh_lines(level.grid, 'black')
+        else:
+            self.mesh = self._add_mesh_cells(level.verts, level.codes,
+                                             'black')
+        if self.field is not None:
+            self.mesh2 = self._add_field_mesh(level)
+        elif self.mesh_style == "lines":
+            with self.stats.stage("prepare"):
+                self._xy2 = level.displaced_grid(self.values(), self.scale)
+            self.mesh2 = self._add_mesh_lines(self._xy2, 'red')
+        else:
+            with self.stats.stage("prepare"):
+                self._xy2 = level.displaced_verts(self.values(), self.scale)
+            self.mesh2 = self._add_mesh_cells(self._xy2, level.codes,
+                                              'red')
+            self._xy2 = self.mesh2.get_path().vertices
+
+    def _add_triangle_meshes(self, triangles):
+        """Add the reference and displaced triangle meshes, each a single
+        polyline of the deduplicated edges."""
+        self.mesh = self._add_mesh_polyline(triangles.verts, 'black')
+        if self.field is not None:
+            self.mesh2 = self._add_field_triangles(triangles)
+        else:
+            with self.stats.stage("prepare"):
+                verts = triangles.displaced_verts(self.values(), self.scale)
+            self.mesh2 = self._add_mesh_polyline(verts, 'red')
+            # moved in place by update
+            self._xy2 = self.mesh2.get_paths()[0].vertices
+
+    def _add_mesh_polyline(self, verts, color):
+        lines = mpl.collections.LineCollection([verts], colors=color,
+                                               alpha=0.5)
+        self.ax.add_collection(lines)
+        return lines
+
+    def _add_mesh_lines(self, xy, color):
+        lines = mpl.collections.LineCollection(mesh.mesh_lines(xy),
+                                               colors=color,
+                                               alpha=0.5)
+        self.ax.add_collection(lines)
+        return lines
+
+    def _add_mesh_cells(self, verts, codes, color):
+        patch = mpl.patches.PathPatch(mpl.path.Path(verts, codes),
+                                      facecolor='none',
+                                      edgecolor=color,
+                                      alpha=0.5)
+        self.ax.add_patch(patch)
+        return patch
+
+    def _add_field_mesh(self, level):
+        """Add the displaced mesh with cells colored by the field (and its
+        colorbar)."""
+        with self.stats.stage("prepare"):
+            values = self.values()
+            self._xy2 = level.displaced_grid(values, self.scale)
+            field = level.field(self.field, values)
+            # pcolormesh needs finite corners, their cells are masked
+            corners = np.where(np.isfinite(self._xy2), self._xy2, 0.0)
+        cmap, vmin, vmax = _color_limits(self.field, field)
+        quadmesh = self.ax.pcolormesh(corners[..., 0], corners[..., 1],
+                                      np.ma.masked_invalid(field), cmap=cmap,
+                                      vmin=vmin, vmax=vmax)
+        self.colorbar = _add_colorbar(self.ax, quadmesh,
+                                      fields.FIELDS[self.field])
+        return quadmesh
+
+    def _update_field_mesh(self, level):
+        """Move the corners of the field colored mesh and update its colors
+        (and the colorbar) in place."""
+        with self.stats.stage("prepare"):
+            values = self.values()
+            level.displaced_grid(values, self.scale, out=self._xy2)
+            field = level.field(self.field, values)
+            corners = self.mesh2.get_coordinates()
+            corners[...] = np.where(np.isfinite(self._xy2), self._xy2, 0.0)
+        self.mesh2.set_array(np.ma.masked_invalid(field))
+        self._update_field_colors(field)
+
+    def _add_field_triangles(self, triangles):
+        """Add the displaced triangles colored by the field (and its
+        colorbar)."""
+        with self.stats.stage("prepare"):
+            values = self.values()
+            self._xy2 = triangles.displaced_positions(values, self.scale)
+            field = triangles.field(self.field, values)
+            displaced = mpl.tri.Triangulation(
+                self._xy2[:, 0], self._xy2[:, 1],
+                triangles.triangulation.triangles)
+        cmap, vmin, vmax = _color_limits(self.field, field)
+        collection = self.ax.tripcolor(displaced,
+                                       facecolors=field,
+                                       cmap=cmap, vmin=vmin, vmax=vmax)
+        self.colorbar = _add_colorbar(self.ax, collection,
+                                      fields.FIELDS[self.field])
+        return collection
+
+    def _update_field_triangles(self, triangles):
+        """Move the field colored triangles and update their colors (and
+        the colorbar) in place."""
+        with self.stats.stage("prepare"):
+            values = self.values()
+            self._xy2 = triangles.displaced_positions(values, self.scale)
+            field = triangles.field(self.field, values)
+            verts = self._xy2[triangles.triangulation.triangles]
+        self.mesh2.set_verts(verts)
+        self.mesh2.set_array(field)
+        self._update_field_colors(field)
+
+    def _update_field_colors(self, field):
+        cmap, vmin, vmax = _color_limits(self.field, field)
+        self.mesh2.set_cmap(cmap)
+        self.mesh2.set_clim(vmin, vmax)
+        self.colorbar.update_normal(self.mesh2)
+
+    def _remove_displaced_mesh(self):
+        """Remove the displaced mesh (and the colorbar)."""
+        if self.colorbar is not None:
+            # before the mesh, the colorbar restores the axes of its mesh
+            self.colorbar.remove()
+            self.colorbar = None
+        self.mesh2.remove()
+
+    def _set_limits(self):
+        x0, x1, y0, y1 = self._extent
+        xy2 = self._xy2.reshape(-1, 2)
+        # missing points are nan, non-finite positions stay infinite
+        xy2 = xy2[np.isfinite(xy2).all(axis=1)]
+        if len(xy2):
+            x0, x1 = min(x0, xy2[:, 0].min()), max(x1, xy2[:, 0].max())
+            y0, y1 = min(y0, xy2[:, 1].min()), max(y1, xy2[:, 1].max())
+        self.ax.set_xlim(x0, x1)
+        self.ax.set_ylim(y0, y1)
+
+
+class HeatmapRenderer(Renderer):
+    """Heatmap of the magnitude of the values or of a derived field.
+
+    Positions on a regular grid (:func:`mpl_qt.grid.grid_sizes`) filling
+    at least :attr:`GRID_MIN_FILL` of the grid nodes are drawn as a single
+    image: the window of the image pyramid (:mod:`mpl_qt.raster`) matching
+    the view, at about screen resolution. Other positions are drawn with
+    tripcolor on their triangulation
+    (:meth:`mpl_qt.model.QuiverModel.triangulation`), derived fields per
+    triangle.
+
+    Attributes
+    ----------
+    scale : float
+        Displacement scale, unused: the heatmap shows the unscaled values
+        (kept for the common renderer interface).
+    quantity : str
+        One of :attr:`QUANTITIES`.
+    image : matplotlib.image.AxesImage or matplotlib.collections.TriMesh or
+        None
+    colorbar : matplotlib.colorbar.Colorbar or None
+    """
+
+    #: Quantities: magnitude of the values or a derived field (see
+    #: :data:`mpl_qt.fields.FIELDS`).
+    QUANTITIES = ("magnitude",) + tuple(fields.FIELDS)
+
+    #: Minimum fraction of filled grid nodes drawn as image.
+    GRID_MIN_FILL = 0.5
+
+    def __init__(self, ax, model, stats=None):
+        super(HeatmapRenderer, self).__init__(ax, model, stats)
+        self.scale = 1.0
+        self.quantity = "magnitude"
+        self.image = None
+        self.colorbar = None
+        self._topology = None
+        self._pyramid = None
+        self._region = None
+        self._tri_gradient = None
+
+    @property
+    def topology(self):
+        """Cached :class:`mpl_qt.mesh.MeshTopology` of the model positions,
+        None if they are no (sufficiently filled) regular grid."""
+        if self._topology is None or self._topology[0] is not self.model.xy:
+            with self.stats.stage("prepare"):
+                self._topology = self.model.xy, self._grid_topology()
+        return self._topology[1]
+
+    @property
+    def is_image(self):
+        """True if the heatmap is drawn as image."""
+        return self.topology is not None
+
+    @instrument.timed("artists")
+    def draw(self):
+        self.ax.clear()
+        self.image = None
+        self.colorbar = None
+        self._region = None
+        if self.is_image:
+            x0, x1, y0, y1 = self.pyramid()[0].extent
+            self.ax.set_xlim(x0, x1)
+            self.ax.set_ylim(y0, y1)
+            self._show_image()
+        else:
+            self._add_tripcolor()
+        self._set_labels()
+
+    @instrument.timed("artists")
+    def update(self):
+        """Update the image data (and colors) in place."""
+        if self.needs_draw():
+            self.draw()
+            return
+        if self.is_image:
+            self._show_image()
+        else:
+            self.colorbar.remove()
+            self.image.remove()
+            self._add_tripcolor()
+        self._set_labels()
+
+    def needs_draw(self):
+        return self.image is None
+
+    def dynamic_artists(self):
+        if self.image is None:
+            return []
+        return [self.image, self.colorbar.ax]
+
+    def model_changed(self, change):
+        self._pyramid = None
+        self._tri_gradient = None
+        if change.positions:
+            self._topology = None
+        elif self._topology is not None and self._topology[1] is not None:
+            self._topology[1].values_changed()
+
+    @instrument.timed("artists")
+    def view_changed(self):
+        """Switch to the pyramid level (window) matching the current view."""
+        if self.image is None or self._region is None:
+            return False
+        level, (xmin, xmax, ymin, ymax) = self._region
+        xlim, ylim = self.ax.get_xlim(), self.ax.get_ylim()
+        if (self._image_level(xlim, ylim) == level and
+                xmin <= min(xlim) and max(xlim) <= xmax and
+                ymin <= min(ylim) and max(ylim) <= ymax):
+            return False
+        LOGGER.debug("view_changed")
+        self._show_image()
+        return True
+
+    def pyramid(self):
+        """Return the image pyramid of the quantity on the grid and its
+        colormap, vmin and vmax (cached per quantity until the model
+        changes).
+
+        Returns
+        -------
+        mpl_qt.raster.ImagePyramid, (str, float, float)
+        """
+        key = self.quantity, self.residual
+        if self._pyramid is None or self._pyramid[0] != key:
+            with self.stats.stage("prepare"):
+                topology = self.topology
+                values = self.values()
+                x0, x1, dx = topology.xgrid[:3]
+                y0, y1, dy = topology.ygrid[:3]
+                if self.quantity == "magnitude":
+                    dgrid = topology.grid_values(values)
+                    image = np.hypot(dgrid[..., 0], dgrid[..., 1])
+                    if topology.mask is not None:
+                        image[topology.mask] = np.nan
+                    # cells centered on the grid points
+                    extent = (x0 - 0.5 * dx, x1 + 0.5 * dx,
+                              y0 - 0.5 * dy, y1 + 0.5 * dy)
+                else:
+                    image = topology.field(self.quantity, values)
+                    extent = (x0, x1, y0, y1)
+                self._pyramid = key, (raster.ImagePyramid(image, extent),
+                                      _color_limits(self.quantity, image))
+        return self._pyramid[1]
+
+    def _grid_topology(self):
+        """Build the topology if the positions fill a regular grid."""
+        if mesh.is_regular_grid(self.model.xy, self.GRID_MIN_FILL):
+            return mesh.MeshTopology(self.model.xy)
+        return None
+
+    def _image_level(self, xlim, ylim):
+        return self.pyramid()[0].level_for_view(xlim, ylim,
+                                                *self.view_pixels())
+
+    def _show_image(self):
+        """Show the window of the pyramid level matching the view, extended
+        by half the view size on each side (small pans need no update)."""
+        pyramid, (cmap, vmin, vmax) = self.pyramid()
+        with self.stats.stage("prepare"):
+            xview, yview = self.ax.get_xlim(), self.ax.get_ylim()
+            level = self._image_level(xview, yview)
+            dx = 0.5 * abs(xview[1] - xview[0])
+            dy = 0.5 * abs(yview[1] - yview[0])
+            region = (min(xview) - dx, max(xview) + dx,
+                      min(yview) - dy, max(yview) + dy)
+            self._region = level, region
+            window, extent = pyramid.view(level, region[:2], region[2:])
+            # imshow expects rows along y
+            data = np.ma.masked_invalid(window.T)
+        if self.image is None:
+            self.image = self.ax.imshow(data, origin="lower", extent=extent,
+                                        interpolation="nearest", cmap=cmap,
+                                        vmin=vmin, vmax=vmax)
+            self.colorbar = _add_colorbar(self.ax, self.image,
+                                          self._quantity_label())
+        else:
+            self.image.set_data(data)
+            self.image.set_extent(extent)
+            self.image.set_cmap(cmap)
+            self.image.set_clim(vmin, vmax)
+            self.colorbar.set_label(self._quantity_label())
+
+    def _add_tripcolor(self):
+        """Add the heatmap of irregular positions (and its colorbar)."""
+        with self.stats.stage("prepare"):
+            triangulation = self.model.triangulation()
+            values = self.values()
+            if self.quantity == "magnitude":
+                colors = np.hypot(values[:, 0], values[:, 1])
+            else:
+                if (self._tri_gradient is None or
+                        self._tri_gradient[0] is not values):
+                    self._tri_gradient = values, fields.triangle_gradient(
+                        self.model.xy, triangulation.triangles, values)
+                colors = fields.derived_field(self.quantity,
+                                              self._tri_gradient[1])
+        cmap, vmin, vmax = _color_limits(self.quantity, colors)
+        if self.quantity == "magnitude":
+            self.image = self.ax.tripcolor(triangulation, colors, cmap=cmap,
+                                           vmin=vmin, vmax=vmax)
+        else:
+            self.image = self.ax.tripcolor(triangulation, facecolors=colors,
+                                           cmap=cmap, vmin=vmin, vmax=vmax)
+        self.colorbar = _add_colorbar(self.ax, self.image,
+                                      self._quantity_label())
+
+    def _quantity_label(self):
+        if self.quantity == "magnitude":
+            return "magnitude {}".format(self.unit).strip()
+        return fields.FIELDS[self.quantity]
+
+
+def _color_limits(quantity, data):
+    """Return colormap, vmin and vmax for the values data of a quantity
+    (magnitude or derived field): sequential for non-negative quantities,
+    diverging and symmetric else."""
+    finite = np.asarray(data)[np.isfinite(data)]
+    vmax = np.abs(finite).max() if finite.size else 0.0
+    if quantity in ("magnitude", "shear"):
+        return "viridis", 0.0, vmax or None
+    return "RdBu_r", -vmax or None, vmax or None
+
+
+def _add_colorbar(ax, mappable, label):
+    """Add a colorbar of mappable right of the axes (inset axes, removed
+    with the axes contents)."""
+    cax = ax.inset_axes([1.02, 0.0, 0.03, 1.0])
+    colorbar = ax.figure.colorbar(mappable, cax=cax)
+    colorbar.set_label(label)
+    return colorbar
@@ -0,0 +1,121 @@
+"""Spatial index of point positions for nearest point queries.
+
+The points are sorted into the square cells of a uniform grid (bucket
+index, see :func:`mpl_qt.grid.grid_index`). The index is the permutation
+sorting the points by cell plus the start of every cell in it (compressed
+rows), built in O(n log n) with a few vectorized passes. A query scans the
+cells in rings around the query cell until no closer point is possible,
+which is O(1) for evenly spread points.
+"""
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+
+import mpl_qt.grid as grid
+
+
+class PointIndex(object):
+    """Uniform grid bucket index of positions.
+
+    Parameters
+    ----------
+    xy : array with shape = (n, 2)
+        Positions, non-finite positions are not indexed.
+    cell_size : float, optional
+        Cell width, defaults to the mean point spacing.
+
+    Attributes
+    ----------
+    shape : (int, int)
+        Number of cells in x and y.
+    """
+
+    def __init__(self, xy, cell_size=None):
+        self.xy = xy
+        valid = np.flatnonzero(np.isfinite(xy[:, 0]) & np.isfinite(xy[:, 1]))
+        x, y = xy[valid, 0], xy[valid, 1]
+        if len(valid):
+            self.origin = x.min(), y.min()
+            width = x.max() - self.origin[0]
+            height = y.max() - self.origin[1]
+        else:
+            self.origin = 0.0, 0.0
+            width = height = 0.0
+        if cell_size is None:
+            # about one point per cell, or per width for points on a line
+            area = width * height or max(width, height)**2
+            cell_size = np.sqrt(area / max(len(valid), 1)) or 1.0
+        self.cell_size = cell_size
+
+        i = grid.grid_index(x, self.origin[0], cell_size)
+        j = grid.grid_index(y, self.origin[1], cell_size)
+        self.shape = (int(i.max()) + 1 if len(i) else 1,
+                      int(j.max()) + 1 if len(j) else 1)
+        cells = i * self.shape[1] + j
+        order = np.argsort(cells, kind="mergesort")
+        self.order = valid[order]
+        counts = np.bincount(cells, minlength=self.shape[0] * self.shape[1])
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+
+    def nearest(self, x, y, max_distance=np.inf):
+        """Return the index of the point closest to (x, y).
+
+        Parameters
+        ----------
+        x, y : float
+        max_distance : float
+            Points further away are ignored.
+
+        Returns
+        -------
+        int or None
+            Index into xy, None if there is no point within max_distance.
+        """
+        nx, ny = self.shape
+        ci = int(np.rint((x - self.origin[0]) / self.cell_size))
+        cj = int(np.rint((y - self.origin[1]) / self.cell_size))
+        # offset of the query from the center of its cell
+        offset = max(abs(x - self.origin[0] - ci * self.cell_size),
+                     abs(y - self.origin[1] - cj * self.cell_size))
+        best, best_d2 = None, max_distance**2
+        # first ring touching the grid
+        r = max(0, ci - nx + 1, -ci, cj - ny + 1, -cj)
+        r_max = max(ci, nx - 1 - ci, cj, ny - 1 - cj)
+        while r <= r_max:
+            # lower bound of the distance to the cells of ring r
+            if r > 0 and ((r - 0.5) * self.cell_size - offset)**2 > best_d2:
+                break
+            candidates = self._ring(ci, cj, r)
+            if len(candidates):
+                d2 = ((self.xy[candidates, 0] - x)**2 +
+                      (self.xy[candidates, 1] - y)**2)
+                k = np.argmin(d2)
+                if d2[k] <= best_d2:
+                    best, best_d2 = int(candidates[k]), d2[k]
+            r += 1
+        return best
+
+    def _ring(self, ci, cj, r):
+        """Return the indices of the points in the cells at Chebyshev
+        distance r of cell (ci, cj)."""
+        if r == 0:
+            i, j = np.array([ci]), np.array([cj])
+        else:
+            d = np.arange(-r, r + 1)
+            side = d[1:-1]
+            i = np.concatenate([ci + d, ci + d, np.full(len(side), ci - r),
+                                np.full(len(side), ci + r)])
+            j = np.concatenate([np.full(len(d), cj - r),
+                                np.full(len(d), cj + r), cj + side, cj + side])
+        inside = (i >= 0) & (i < self.shape[0]) & (j >= 0) & (j < self.shape[1])
+        cells = i[inside] * self.shape[1] + j[inside]
+        starts = self.starts[cells]
+        counts = self.starts[cells + 1] - starts
+        # concatenated ranges starts[k]:starts[k] + counts[k] of order
+        ends = np.cumsum(counts)
+        positions = (np.arange(ends[-1] if len(ends) else 0) +
+                     np.repeat(starts - ends + counts, counts))
+        return self.order[positions]
@@ -3,38 +3,179 @@ from __future__ import print_function
 from __future__ import absolute_import
 
 import sys
-import numpy as np
+import functools
+import threading
 import logging
 
+import numpy as np
 from PySide import QtGui
 from PySide import QtCore
 
-from matplotlib.backends.backend_qt4agg import FigureCanvasQTAgg as FigureCanvas
+import matplotlib
+matplotlib.use("Qt4Agg")
+matplotlib.rcParams['backend.qt4'] = 'PySide'
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_qt4agg import FigureCanvasQTAgg
 from matplotlib.backends.backend_qt4agg import NavigationToolbar2QT
 from matplotlib.figure import Figure
-import matplotlib as mpl
+import matplotlib.image
+import matplotlib.lines
 
-import mpl_qt.grid as grid
+import mpl_qt.fields as fields
+import mpl_qt.instrument as instrument
+import mpl_qt.mesh as mesh
+import mpl_qt.render as render
+import mpl_qt.spatial as spatial
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+def _draw_locked(method):
+    """Decorate a plot widget method changing artists to hold the draw lock
+    of the canvas: matplotlib is not thread-safe, the figure must not
+    change while a render thread rasterizes it."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.canvas.draw_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class FigureCanvas(FigureCanvasQTAgg):
+    """Qt canvas serializing draws, which may happen in render threads
+    (see :mod:`mpl_qt.ui.scheduler`).
+
+    Attributes
+    ----------
+    draw_lock : threading.RLock
+        Held while the figure is rasterized or the buffer painted.
+    in_render_thread : bool
+        True while :meth:`draw_buffer` rasterizes, the draw event callbacks
+        are called then.
+    stats : mpl_qt.instrument.RenderStats or None
+        Records the rasterization stage and completes the frames.
+    overlay : matplotlib.text.Text or None
+        Shows the text of stats (updated before every draw).
+    """
+
+    stats = None
+    overlay = None
+    in_render_thread = False
+
+    def __init__(self, figure):
+        self.draw_lock = threading.RLock()
+        super(FigureCanvas, self).__init__(figure)
+
+    def draw(self):
+        self._rasterize(super(FigureCanvas, self).draw)
+
+    def draw_buffer(self):
+        """Rasterize into the Agg buffer without repainting the widget, safe
+        to call from other threads than the GUI thread."""
+        def draw():
+            self.in_render_thread = True
+            try:
+                FigureCanvasAgg.draw(self)
+            finally:
+                self.in_render_thread = False
+        self._rasterize(draw)
+
+    def paintEvent(self, event):
+        # don't show a buffer half-drawn by a render thread
+        with self.draw_lock:
+            super(FigureCanvas, self).paintEvent(event)
+
+    def draw_artists(self, background, artists):
+        """Restore the saved background (see copy_from_bbox) of the figure,
+        draw only artists on it and repaint (blitting)."""
+        def draw():
+            self.restore_region(background)
+            for artist in artists:
+                (artist.axes or self.figure).draw_artist(artist)
+        self._rasterize(draw)
+        self.blit(self.figure.bbox)
+
+    def _rasterize(self, draw):
+        with self.draw_lock:
+            if self.stats is None:
+                draw()
+                return
+            if self.overlay is not None:
+                self.overlay.set_text(self.stats.format())
+            with self.stats.stage("rasterize"):
+                draw()
+            self.stats.end_frame(*instrument.count_artists(self.figure))
+
+
 class PlotWidget(QtGui.QWidget):
     """Base class for plot widgets.
+
+    Subclasses set the attribute model before calling ``__init__``, an
+    observable model (see :class:`mpl_qt.model.QuiverModel`) is subscribed
+    to :meth:`on_model_changed`.
+
+    Attributes
+    ----------
+    scheduler : mpl_qt.ui.scheduler.RenderScheduler or None
+        Coalesces updates and renders off the GUI thread, if set. Without
+        scheduler updates and renders are synchronous.
+    stats : mpl_qt.instrument.RenderStats
+        Stage timings and artist counts of the frames.
+
+    Updates and redraws scheduled while the widget is hidden (eg. in an
+    inactive tab) are deferred until it is shown. Methods changing artists
+    hold the draw lock of the canvas (see :class:`FigureCanvas`), they wait
+    for a render thread rasterizing the figure.
+
+    Clicks and mouse moves are mapped to the nearest model point through a
+    spatial index of the positions (see :meth:`point_index`), not through
+    matplotlib's picking, which tests every element of every artist. A
+    click emits :attr:`point_picked` and marks the point, hovering shows a
+    tooltip of the point, at most every :attr:`HOVER_INTERVAL` ms.
+
+    The overlays (see :meth:`overlay_artists`) are animated: a full draw
+    skips them and saves the background, they are drawn on a copy of it
+    (blitting, see :meth:`draw_overlays`). While panning, the axes show the
+    raster of their artists at the last full draw, moved and scaled to the
+    current view (see :meth:`start_preview`), the artists are drawn again
+    when the mouse button is released.
     """
 
+    #: Emitted with index and description of a clicked model point.
+    point_picked = QtCore.Signal(int, str)
+
+    #: Distance (pixels) within which a point is picked or hovered.
+    PICK_RADIUS = 8
+    #: Minimal interval (ms) of the hover lookups.
+    HOVER_INTERVAL = 50
+
+    scheduler = None
+    _dirty = None
+    _point_index = None
+    _picked = None
+    _pick_marker = None
+    _background = None
+    _unfinished = False
+    _snapshot = None
+    _preview = None
+
     def __init__(self, parent=None):
         super(PlotWidget, self).__init__(parent)
 
         self.fig = Figure()
-        self.ax = self.fig.add_subplot(111)
-        self.ax.set_aspect('equal')
-        self.ax.grid(True)
+        self.ax = render.setup_axes(self.fig)
 
         self.canvas = FigureCanvas(self.fig)
         #self.canvas.setParent(self)
-        self.canvas.mpl_connect('pick_event', self.on_pick)
+        self.canvas.mpl_connect('button_press_event', self.on_button_press)
+        self.canvas.mpl_connect('button_release_event',
+                                self.on_button_release)
+        self.canvas.mpl_connect('motion_notify_event', self.on_motion)
+        self.canvas.mpl_connect('draw_event', self.on_draw_event)
+        self.stats = instrument.RenderStats(type(self).__name__)
+        self.canvas.stats = self.stats
 
         self.mpl_toolbar = NavigationToolbar2QT(self.canvas, self)
 
@@ -42,22 +183,380 @@ class PlotWidget(QtGui.QWidget):
         self.verticalLayout.addWidget(self.canvas)
         self.verticalLayout.addWidget(self.mpl_toolbar)
 
+        self._hover = None
+        self._hover_timer = QtCore.QTimer(self)
+        self._hover_timer.setSingleShot(True)
+        self._hover_timer.setInterval(self.HOVER_INTERVAL)
+        self._hover_timer.timeout.connect(self.on_hover)
+
+        self.setup()
+        model = getattr(self, "model", None)
+        if hasattr(model, "subscribe"):
+            model.subscribe(self.on_model_changed)
+
         self.on_draw()
 
+    def setup(self):
+        """Called before the first draw, after the figure and canvas are
+        created."""
+        pass
+
+    @property
+    def show_stats(self):
+        """Show the render statistics (:attr:`stats`) on the canvas."""
+        return self.canvas.overlay is not None
+
+    @show_stats.setter
+    @_draw_locked
+    def show_stats(self, show):
+        if show and self.canvas.overlay is None:
+            self.canvas.overlay = self.fig.text(
+                0.01, 0.99, "", ha="left", va="top", family="monospace",
+                fontsize="x-small", alpha=0.8)
+        elif not show and self.canvas.overlay is not None:
+            self.canvas.overlay.remove()
+            self.canvas.overlay = None
+        self._mark_animated()
+        self.canvas.draw_idle()
+
+    @_draw_locked
+    @instrument.timed("artists")
     def on_draw(self):
         """(Re-)draw the figure.
         """
         self.ax.clear()
-        self.canvas.draw()
+        self._mark_animated()
+        self.render()
+
+    def on_update(self):
+        """Update the existing artists and re-render the canvas.
+
+        Subclasses which are able to modify their artists in place override
+        this method, the default is a full :meth:`on_draw`.
+        """
+        self.on_draw()
 
-    def on_pick(self, event):
+    def schedule_update(self):
+        """Request :meth:`on_update`, coalesced with other requests by the
+        scheduler (if any)."""
+        if not self.isVisible():
+            self._dirty = self._dirty or "update"
+        elif self.scheduler is None:
+            self.on_update()
+        else:
+            self.scheduler.request(self)
+
+    def schedule_draw(self):
+        """Request :meth:`on_draw`, deferred while the widget is hidden."""
+        if not self.isVisible():
+            self._dirty = "draw"
+        else:
+            self.on_draw()
+
+    def showEvent(self, event):
+        super(PlotWidget, self).showEvent(event)
+        dirty, self._dirty = self._dirty, None
+        if dirty == "draw":
+            self.on_draw()
+        elif dirty == "update":
+            self.schedule_update()
+
+    def render(self):
+        """Rasterize the figure and show it, in a render thread of the
+        scheduler (if any)."""
+        if self.scheduler is None:
+            self.canvas.draw()
+        else:
+            self.scheduler.render(self)
+
+    def on_draw_event(self, event):
+        """Save the background after a full draw (the animated artists are
+        skipped) and the raster of the axes for previews (also without the
+        animated artists), then draw the animated artists on it.
+
+        After a draw in a render thread this is done on the GUI thread, see
+        :meth:`on_render_finished`.
         """
+        # saving draws the animated artists as well
+        if self.canvas.is_saving():
+            return
+        if self.canvas.in_render_thread:
+            # the background of the previous draw no longer matches
+            self._background = None
+            self._unfinished = True
+            return
+        self._save_background()
+
+    @_draw_locked
+    def on_render_finished(self):
+        """Complete the buffer rasterized by a render thread (see
+        :meth:`on_draw_event`) on the GUI thread and show it."""
+        if self._unfinished:
+            self._save_background()
+        self.canvas.update()
+
+    def _save_background(self):
+        self._unfinished = False
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        if self._preview is None:
+            self._snapshot = self._axes_raster()
+        for artist in self._animated_artists():
+            # hidden by the preview
+            if artist.get_visible():
+                (artist.axes or self.fig).draw_artist(artist)
+
+    def overlay_artists(self):
+        """Return the artists of the overlays (pick marker, statistics).
+
+        Overlays are always animated, they are blitted by
+        :meth:`draw_overlays` instead of redrawing the figure.
+        """
+        artists = []
+        marker = self._pick_marker_artist()
+        if marker is not None:
+            artists.append(marker)
+        if self.canvas.overlay is not None:
+            artists.append(self.canvas.overlay)
+        return artists
+
+    @_draw_locked
+    def draw_overlays(self):
+        """Draw the animated artists on the background saved at the last
+        full draw, or request a full draw if there is no background."""
+        self._mark_animated()
+        if self._background is None:
+            self.canvas.draw_idle()
+        else:
+            self.canvas.draw_artists(self._background,
+                                     self._animated_artists())
+
+    @property
+    def previewing(self):
+        """True while the axes show the preview raster (see
+        :meth:`start_preview`)."""
+        return self._preview is not None
+
+    @_draw_locked
+    def start_preview(self):
+        """Show the raster of the axes at the last full draw instead of
+        their artists, until :meth:`end_preview`.
+
+        The raster is an image at the axes limits of that draw, so changing
+        the limits moves and scales it: redrawing costs one image
+        resampling, independent of the number of elements of the artists.
+        The animated artists are not in the raster, they are still drawn:
+        the overlays and, for animated widgets (eg. streaming), the dynamic
+        artists.
+        """
+        if self._preview is not None or self._snapshot is None:
+            return
+        raster, extent = self._snapshot
+        animated = self._animated_artists()
+        hidden = [(artist, artist.get_animated())
+                  for artist in self._axes_artists()
+                  if artist.get_visible() and artist not in animated]
+        for artist, _ in hidden:
+            # full draws skip animated artists (some artists, eg. Quiver,
+            # prepare their data before testing the visibility)
+            artist.set_visible(False)
+            artist.set_animated(True)
+        # above the grid lines (also in the raster), below the spines
+        image = matplotlib.image.AxesImage(self.ax, extent=extent,
+                                           origin="upper",
+                                           interpolation="nearest",
+                                           zorder=2)
+        image.set_data(raster)
+        self.ax.add_image(image)
+        self._preview = image, hidden
+
+    @_draw_locked
+    def end_preview(self):
+        """Remove the preview raster, show the artists adapted to the
+        current view and redraw."""
+        if self._preview is None:
+            return
+        image, hidden = self._preview
+        self._preview = None
+        # a full draw during the preview cleared the axes
+        if image.axes is self.ax:
+            image.remove()
+        for artist, animated in hidden:
+            artist.set_visible(True)
+            artist.set_animated(animated)
+        self.on_view_changed(self.ax)
+        self.canvas.draw_idle()
+
+    def on_model_changed(self, model, change):
+        """Called on changes of the model, the default is a full redraw.
+
         Parameters
         ----------
-        event : matplotlib.backend_bases.PickEvent
+        model : mpl_qt.model.QuiverModel
+        change : mpl_qt.model.ModelChange
         """
-        msg = "You've clicked :\n {}".format(event)
-        QtGui.QMessageBox.information(self, "Click!", msg)
+        self.schedule_draw()
+
+    def on_view_changed(self, ax):
+        """Called on changes of the axes limits (eg. pan/zoom).
+
+        Connected by :meth:`connect_view_changed`.
+
+        Parameters
+        ----------
+        ax : matplotlib.axes.Axes
+        """
+        pass
+
+    def connect_view_changed(self):
+        """Connect :meth:`on_view_changed` to the axes limit changes.
+
+        Has to be called again after clearing the axes.
+        """
+        self.ax.callbacks.connect('xlim_changed', self.on_view_changed)
+        self.ax.callbacks.connect('ylim_changed', self.on_view_changed)
+
+    def point_index(self):
+        """Return the spatial index of the model positions (see
+        :meth:`mpl_qt.model.QuiverModel.point_index`), None without model.
+        """
+        model = getattr(self, "model", None)
+        if model is None:
+            return None
+        if hasattr(model, "point_index"):
+            return model.point_index()
+        if self._point_index is None or self._point_index.xy is not model.xy:
+            self._point_index = spatial.PointIndex(model.xy)
+        return self._point_index
+
+    def nearest_point(self, event):
+        """Return the index of the model point within :attr:`PICK_RADIUS`
+        pixels of a mouse event, or None.
+
+        Parameters
+        ----------
+        event : matplotlib.backend_bases.MouseEvent
+        """
+        if event.inaxes is not self.ax:
+            return None
+        index = self.point_index()
+        if index is None:
+            return None
+        inverse = self.ax.transData.inverted()
+        (x, y), (x1, y1) = inverse.transform(
+            [(event.x, event.y),
+             (event.x + self.PICK_RADIUS, event.y + self.PICK_RADIUS)])
+        return index.nearest(x, y, max(abs(x1 - x), abs(y1 - y)))
+
+    def point_text(self, i):
+        """Return the description of model point i (position and value)."""
+        text = "#{}: x = {:.4g}, y = {:.4g}".format(i, *self.model.xy[i])
+        xyvalue = getattr(self.model, "xyvalue", None)
+        if xyvalue is not None:
+            text += "\ndx = {:.4g}, dy = {:.4g}".format(*xyvalue[i])
+        return text
+
+    def on_button_press(self, event):
+        """Start the preview when panning, else pick the point nearest to a
+        left click (unless zooming).
+
+        Parameters
+        ----------
+        event : matplotlib.backend_bases.MouseEvent
+        """
+        if self.mpl_toolbar.mode == "pan/zoom":
+            if event.inaxes is self.ax:
+                self.start_preview()
+            return
+        if event.button != 1 or self.mpl_toolbar.mode:
+            return
+        i = self.nearest_point(event)
+        if i is not None:
+            self.on_point_picked(i)
+
+    def on_button_release(self, event):
+        """End the preview of panning.
+
+        Parameters
+        ----------
+        event : matplotlib.backend_bases.MouseEvent
+        """
+        self.end_preview()
+
+    def on_point_picked(self, i):
+        """Called with the index of a clicked model point, marks it."""
+        text = self.point_text(i)
+        self._picked = i
+        self.draw_overlays()
+        QtGui.QToolTip.showText(QtGui.QCursor.pos(), text, self.canvas)
+        self.point_picked.emit(i, text)
+
+    def on_motion(self, event):
+        """Throttle the hover lookups of mouse moves (see :meth:`on_hover`).
+
+        Parameters
+        ----------
+        event : matplotlib.backend_bases.MouseEvent
+        """
+        self._hover = event
+        if not self._hover_timer.isActive():
+            self._hover_timer.start()
+
+    def on_hover(self):
+        """Show the point under the last mouse position as tooltip."""
+        event, self._hover = self._hover, None
+        i = None if event is None else self.nearest_point(event)
+        if i is None:
+            QtGui.QToolTip.hideText()
+        else:
+            QtGui.QToolTip.showText(QtGui.QCursor.pos(), self.point_text(i),
+                                    self.canvas)
+
+    def _pick_marker_artist(self):
+        """Return the marker of the picked point (added to the axes again
+        after they were cleared), None if no point is picked."""
+        xy = getattr(getattr(self, "model", None), "xy", None)
+        if self._picked is None or xy is None or self._picked >= len(xy):
+            return None
+        marker = self._pick_marker
+        if marker is None or marker.axes is not self.ax:
+            # add_artist does not change the data limits
+            marker = matplotlib.lines.Line2D(
+                [], [], marker="o", markersize=12, markerfacecolor="none",
+                markeredgecolor="orange", markeredgewidth=2, animated=True)
+            self.ax.add_artist(marker)
+            self._pick_marker = marker
+        x, y = xy[self._picked]
+        marker.set_data([x], [y])
+        return marker
+
+    def _animated_artists(self):
+        return self.overlay_artists()
+
+    def _mark_animated(self):
+        for artist in self._animated_artists():
+            if not artist.get_animated():
+                artist.set_animated(True)
+                # new or changed artists: the background needs a full draw
+                self._background = None
+
+    def _axes_artists(self):
+        """Return the artists drawn in the axes (not the axis, spines and
+        the axes patch)."""
+        ax = self.ax
+        return (list(ax.collections) + list(ax.patches) + list(ax.lines) +
+                list(ax.images) + list(ax.texts) + list(ax.artists))
+
+    def _axes_raster(self):
+        """Copy the pixels of the axes from the canvas, return them (rows
+        from the top) and their extent (the axes limits)."""
+        buffer = np.asarray(self.canvas.buffer_rgba())
+        x0, y0, x1, y1 = np.rint(self.ax.bbox.extents).astype(int)
+        height = buffer.shape[0]
+        raster = buffer[max(height - y1, 0):max(height - y0, 0),
+                        max(x0, 0):max(x1, 0)].copy()
+        if not raster.size:
+            return None
+        return raster, tuple(self.ax.get_xlim()) + tuple(self.ax.get_ylim())
 
 
 class ScatterPlotWidget(PlotWidget):
@@ -72,175 +571,301 @@ class ScatterPlotWidget(PlotWidget):
         self.model = model
         super(ScatterPlotWidget, self).__init__(parent)
 
+    @_draw_locked
+    @instrument.timed("artists")
     def on_draw(self):
         self.ax.clear()
 
         xy = self.model.xy
-        self.ax.scatter(xy[:, 0], xy[:, 1], picker=True)
+        self.ax.scatter(xy[:, 0], xy[:, 1])
 
-        self.canvas.draw()
+        self._mark_animated()
+        self.render()
 
-    def on_pick(self, event):
-        """
-        Parameters
-        ----------
-        event : matplotlib.backend_bases.PickEvent
-        """
-        i = event.ind
-        xy = self.model.xy
-        msg = "You've clicked on coords:\n {}".format(xy[i])
-        QtGui.QMessageBox.information(self, "Click!", msg)
 
+class RendererPlotWidget(PlotWidget):
+    """Plot widget drawing with a renderer of :mod:`mpl_qt.render`.
+
+    Subclasses set :attr:`renderer_class`.
 
-class QuiverPlotWidget(PlotWidget):
-    """
     Attributes
     ----------
-    model :
-        Has attributes xy, xyvalue (arrays of shape = (n, 2)) and unit (str).
+    renderer : mpl_qt.render.Renderer
     """
 
+    #: Renderer class, called with axes, model and stats.
+    renderer_class = None
+
+    _animated = False
 
     def __init__(self, parent=None, model=None):
         self.model = model
-        key_sample = self.model.xyvalue[(self.model.xyvalue[:, 0] != 0) |
-                                        (self.model.xyvalue[:, 1] != 0)]
-        self._key_length = np.sqrt(np.mean(np.sum(key_sample**2, axis=1)))
-        self._scale = 1.0
-        self._unit = ""
-        super(QuiverPlotWidget, self).__init__(parent)
+        super(RendererPlotWidget, self).__init__(parent)
+
+    def setup(self):
+        self.renderer = self.renderer_class(self.ax, self.model,
+                                            stats=self.stats)
+
+    @property
+    def animated(self):
+        """Update by blitting only the dynamic artists of the renderer (see
+        :meth:`mpl_qt.render.Renderer.dynamic_artists`) onto the background
+        saved at the last full draw, eg. for streaming models."""
+        return self._animated
+
+    @animated.setter
+    def animated(self, animated):
+        if animated == self._animated:
+            return
+        self._animated = animated
+        self._background = None
+        self.on_draw()
+
+    @property
+    def residual(self):
+        """Show the non-affine residual of the values (see
+        :attr:`mpl_qt.render.Renderer.residual`)."""
+        return self.renderer.residual
+
+    @residual.setter
+    def residual(self, residual):
+        self.renderer.residual = residual
+        self.schedule_update()
+
+    def point_text(self, i):
+        text = super(RendererPlotWidget, self).point_text(i)
+        if self.renderer.residual:
+            text += "\nresidual dx = {:.4g}, dy = {:.4g}".format(
+                *self.model.residual_values()[i])
+        return text
+
+    @_draw_locked
+    def on_draw(self):
+        LOGGER.debug("on_draw")
+        self.renderer.draw()
+        self._mark_animated()
+        self.connect_view_changed()
+        self.render()
+
+    @_draw_locked
+    def on_update(self):
+        """Update the existing artists (see
+        :meth:`mpl_qt.render.Renderer.update`) and re-render the canvas.
+
+        Animated widgets only blit the dynamic artists, unless the update
+        changed the axes limits (invalidating the background).
+        """
+        LOGGER.debug("on_update")
+        if self.renderer.needs_draw():
+            self.on_draw()
+            return
+        limits = self.ax.get_xlim(), self.ax.get_ylim()
+        self.renderer.update()
+        self._mark_animated()
+        if (self._animated and self._background is not None and
+                limits == (self.ax.get_xlim(), self.ax.get_ylim())):
+            self.canvas.draw_artists(self._background,
+                                     self._animated_artists())
+        else:
+            self.render()
+
+    def on_model_changed(self, model, change):
+        """Redraw if the positions changed, else update."""
+        LOGGER.debug("on_model_changed %s", change)
+        self.renderer.model_changed(change)
+        if change.positions:
+            self.schedule_draw()
+        else:
+            self.schedule_update()
+
+    @_draw_locked
+    def on_view_changed(self, ax):
+        """Adapt the artists to the current view (see
+        :meth:`mpl_qt.render.Renderer.view_changed`), after the preview of
+        panning."""
+        if self.previewing:
+            return
+        if self.renderer.view_changed():
+            self._mark_animated()
+            self.canvas.draw_idle()
+
+    def _add_toolbar_combo(self, items, tooltip, slot):
+        """Add a combo box of items to the toolbar, calling slot(index) on
+        selection."""
+        combo = QtGui.QComboBox(self)
+        combo.addItems(items)
+        combo.setToolTip(tooltip)
+        combo.currentIndexChanged.connect(slot)
+        self.mpl_toolbar.addSeparator()
+        self.mpl_toolbar.addWidget(combo)
+        return combo
+
+    def overlay_artists(self):
+        artists = super(RendererPlotWidget, self).overlay_artists()
+        return self.renderer.overlay_artists() + artists
+
+    def _animated_artists(self):
+        overlays = self.overlay_artists()
+        if not self._animated:
+            return overlays
+        return ([artist for artist in self.renderer.dynamic_artists()
+                 if artist not in overlays] + overlays)
+
+    def _mark_animated(self):
+        overlays = self.overlay_artists()
+        for artist in self.renderer.dynamic_artists() + overlays:
+            animated = self._animated or artist in overlays
+            if artist.get_animated() != animated:
+                artist.set_animated(animated)
+                # new or changed artists: the background needs a full draw
+                self._background = None
+
+
+class QuiverPlotWidget(RendererPlotWidget):
+    """
+    Attributes
+    ----------
+    model :
+        Has attributes xy, xyvalue (arrays of shape = (n, 2)).
+    renderer : mpl_qt.render.QuiverRenderer
+    """
+
+    renderer_class = render.QuiverRenderer
 
     @property
     def scale(self):
-        return self._scale
+        return self.renderer.scale
 
     @scale.setter
     def scale(self, scale):
-        self._scale = scale
-        self.on_draw()
+        self.renderer.scale = scale
+        self.schedule_update()
 
     @property
     def key_length(self):
-        return self._key_length
+        return self.renderer.key_length
 
     @key_length.setter
+    @_draw_locked
     def key_length(self, length):
-        self._key_length = length
-        self.on_draw()
+        self.renderer.key_length = length
+        if self.renderer.needs_draw() or not self.isVisible():
+            self.schedule_update()
+        else:
+            # only the key changed, blit it
+            self.renderer.update_key()
+            self.draw_overlays()
 
     @property
     def unit(self):
-        return self._unit
+        return self.renderer.unit
 
     @unit.setter
     def unit(self, unit):
-        self._unit = unit
-        self.on_draw()
+        self.renderer.unit = unit
+        self.schedule_update()
 
-    def on_draw(self):
-        LOGGER.debug("on_draw")
-        self.ax.clear()
+    @property
+    def lod(self):
+        """Draw one mean arrow per screen cell instead of every arrow
+        (level of detail aggregation, see :mod:`mpl_qt.lod`)."""
+        return self.renderer.lod
+
+    @lod.setter
+    def lod(self, lod):
+        self.renderer.lod = lod
+        self.on_draw()
 
-        xy = self.model.xy
-        xyvalue = self.model.xyvalue
-        qax = self.ax.quiver(xy[:, 0], xy[:, 1],
-                             xyvalue[:, 0], xyvalue[:, 1],
-                             units="xy",
-                             scale=self.scale,
-                             picker=True)
+    @property
+    def lod_cache(self):
+        """Cached :class:`mpl_qt.lod.QuiverLOD` of the model data."""
+        return self.renderer.lod_cache
 
-        self.ax.quiverkey(qax, 1.05, 1.05,
-                          U=self.key_length,
-                          coordinates="axes",
-                          label="{:2.3e} {}".format(self.key_length, self.unit),
-                          linewidths=(1,),
-                          edgecolors=('k'),
-                          color="r",
-                          labelpos="S")
 
-        self.ax.set_xlabel(self.unit)
-        self.ax.set_ylabel(self.unit)
+class MeshplotWidget(RendererPlotWidget):
+    """
+    Attributes
+    ----------
+    model :
+        Has attributes xy, xyvalue (arrays of shape = (n, 2)).
+    renderer : mpl_qt.render.MeshRenderer
+    """
 
-        self.canvas.draw()
+    renderer_class = render.MeshRenderer
 
+    #: Available mesh styles (see :class:`mpl_qt.render.MeshRenderer`).
+    MESH_STYLES = render.MeshRenderer.MESH_STYLES
 
-class MeshplotWidget(PlotWidget):
+    #: Derived fields the displaced mesh can be colored by (see
+    #: :mod:`mpl_qt.fields`).
+    FIELDS = tuple(fields.FIELDS)
 
-    def __init__(self, parent=None, model=None):
-        LOGGER.debug("__init__")
-        self.model = model
-        self._scale = 1.0
-        self._unit = ""
-        super(MeshplotWidget, self).__init__(parent)
+    def setup(self):
+        super(MeshplotWidget, self).setup()
+        self.fieldCombo = self._add_toolbar_combo(
+            ["outline"] + [fields.FIELDS[name] for name in self.FIELDS],
+            "Color the displaced mesh by a derived field",
+            self.on_field_selected)
 
     @property
     def scale(self):
-        return self._scale
+        return self.renderer.scale
 
     @scale.setter
     def scale(self, scale):
-        self._scale = scale
-        self.on_draw()
+        self.renderer.scale = scale
+        self.schedule_update()
 
     @property
     def unit(self):
-        return self._unit
+        return self.renderer.unit
 
     @unit.setter
     def unit(self, unit):
-        self._unit = unit
+        self.renderer.unit = unit
+        self.schedule_update()
+
+    @property
+    def mesh_style(self):
+        """Mesh style, one of :attr:`MESH_STYLES`."""
+        return self.renderer.mesh_style
+
+    @mesh_style.setter
+    def mesh_style(self, style):
+        if style not in self.MESH_STYLES:
+            raise ValueError("unknown mesh style {!r}".format(style))
+        self.renderer.mesh_style = style
         self.on_draw()
 
-    def on_draw(self):
-        LOGGER.debug("on_draw")
-        self.ax.clear()
+    @property
+    def field(self):
+        """Derived field the cells of the displaced mesh are colored by,
+        one of :attr:`FIELDS` or None for the outline."""
+        return self.renderer.field
+
+    @field.setter
+    def field(self, field):
+        if field is not None and field not in self.FIELDS:
+            raise ValueError("unknown field {!r}".format(field))
+        if field == self.renderer.field:
+            return
+        self.renderer.field = field
+        self.fieldCombo.setCurrentIndex(
+            0 if field is None else self.FIELDS.index(field) + 1)
+        self.on_draw()
 
-        xy = self.model.xy
-        xyvalue = self.model.xyvalue
-
-        # sort ascending 1) x 2) y
-        i_srt = np.lexsort((xy[:, 0], xy[:, 1]))
-        xy = xy[i_srt]
-        xy2 = (xy + xyvalue * self.scale)[i_srt]
-
-        # reshape data to extract grid tile corner arrays
-        x0, x1, dx, nx = grid.grid_size(xy[:, 0])
-        y0, y1, dy, ny = grid.grid_size(xy[:, 1])
-        x = xy[:, 0].reshape(nx, ny)
-        y = xy[:, 1].reshape(nx, ny)
-        x2 = xy2[:, 0].reshape(nx, ny)
-        y2 = xy2[:, 1].reshape(nx, ny)
-
-        # exctract vertices and their path codes for grid tiles
-        verts, codes = self._mesh_verts_codes(x, y)
-        vertspath = mpl.path.Path(verts, codes)
-        patch = mpl.patches.PathPatch(vertspath,
-                                      facecolor='none',
-                                      edgecolor='black',
-                                      alpha=0.5)
-        self.ax.add_patch(patch)
-
-        verts2, codes2 = self._mesh_verts_codes(x2, y2)
-        vertspath2 = mpl.path.Path(verts2, codes2)
-        patch2 = mpl.patches.PathPatch(vertspath2,
-                                      facecolor='none',
-                                      edgecolor='red',
-                                      alpha=0.5)
-        self.ax.add_patch(patch2)
-
-        # plot grid tile corner points
-        #self.ax.plot(xy[:, 0], xy[:, 1], 'ko')
-        #self.ax.plot(xy2[:, 0], xy2[:, 1], 'ro')
-
-        # setup plot
-        self.ax.set_xlim(min(x.min(), x2.min()),
-                         max(x.max(), x2.max()))
-        self.ax.set_ylim(min(y.min(), y2.min()),
-                         max(y.max(), y2.max()))
-        self.ax.set_xlabel(self.unit)
-        self.ax.set_ylabel(self.unit)
-
-        self.canvas.draw()
+    def on_field_selected(self, index):
+        self.field = None if index <= 0 else self.FIELDS[index - 1]
+
+    @property
+    def topology(self):
+        """Cached :class:`mpl_qt.mesh.MeshTopology` of the model positions."""
+        return self.renderer.topology
+
+    @property
+    def triangles(self):
+        """Cached :class:`mpl_qt.mesh.TriangleMesh` of the model positions."""
+        return self.renderer.triangles
 
     def _mesh_verts_codes(self, x, y):
         """Calculate mesh vertices and their path codes from grid positions.
@@ -252,38 +877,68 @@ class MeshplotWidget(PlotWidget):
 
         Returns
         -------
-        verts : array with shape = (nx*ny*(1+3+1), 2)
+        verts : array with shape = ((nx-1)*(ny-1)*(1+3+1), 2)
             Vertex positions for mesh path codes.
-        codes : array with shape = (nx*ny*(1+3+1),)
+        codes : array with shape = ((nx-1)*(ny-1)*(1+3+1),)
             Mesh path codes (1x mpl.path.Path.MOVETO, 3x mpl.path.Path.LINETO,
             1x mpl.path.Path.CLOSEPOLY)
         """
-        lowerleftx = x[:-1, :-1].flatten()
-        lowerrightx = x[:-1, 1:].flatten()
-        lowerlefty = y[:-1, :-1].flatten()
-        lowerrighty = y[:-1, 1:].flatten()
-        #lowerlefty, lowerrighty
-        upperleftx = x[1:, :-1].flatten()
-        upperrightx = x[1:, 1:].flatten()
-        upperlefty = y[1:, :-1].flatten()
-        upperrighty = y[1:, 1:].flatten()
-
-        nrects = (x.shape[0]-1) * (x.shape[1]-1)
-        nverts = nrects * (1+3+1)
-        verts = np.zeros((nverts, 2))
-
-        codes = np.ones(nverts, int) * mpl.path.Path.LINETO
-        codes[0::5] = mpl.path.Path.MOVETO
-        codes[4::5] = mpl.path.Path.CLOSEPOLY
-
-        verts[0::5,0] = lowerleftx
-        verts[0::5,1] = lowerlefty
-        verts[1::5,0] = upperleftx
-        verts[1::5,1] = upperlefty
-        verts[2::5,0] = upperrightx
-        verts[2::5,1] = upperrighty
-        verts[3::5,0] = lowerrightx
-        verts[3::5,1] = lowerrighty
-
-        return verts, codes
+        return mesh.mesh_verts_codes(x, y)
+
+
+class HeatmapPlotWidget(RendererPlotWidget):
+    """Heatmap of the magnitude of the values or of a derived field.
+
+    Attributes
+    ----------
+    model :
+        Has attributes xy, xyvalue (arrays of shape = (n, 2)).
+    renderer : mpl_qt.render.HeatmapRenderer
+    """
+
+    renderer_class = render.HeatmapRenderer
+
+    #: Available quantities (see :class:`mpl_qt.render.HeatmapRenderer`).
+    QUANTITIES = render.HeatmapRenderer.QUANTITIES
 
+    def setup(self):
+        super(HeatmapPlotWidget, self).setup()
+        self.quantityCombo = self._add_toolbar_combo(
+            [fields.FIELDS.get(name, name) for name in self.QUANTITIES],
+            "Quantity shown", self.on_quantity_selected)
+
+    @property
+    def scale(self):
+        return self.renderer.scale
+
+    @scale.setter
+    def scale(self, scale):
+        # the heatmap shows the unscaled values, nothing to update
+        self.renderer.scale = scale
+
+    @property
+    def unit(self):
+        return self.renderer.unit
+
+    @unit.setter
+    def unit(self, unit):
+        self.renderer.unit = unit
+        self.schedule_update()
+
+    @property
+    def quantity(self):
+        """Quantity shown, one of :attr:`QUANTITIES`."""
+        return self.renderer.quantity
+
+    @quantity.setter
+    def quantity(self, quantity):
+        if quantity not in self.QUANTITIES:
+            raise ValueError("unknown quantity {!r}".format(quantity))
+        if quantity == self.renderer.quantity:
+            return
+        self.renderer.quantity = quantity
+        self.quantityCombo.setCurrentIndex(self.QUANTITIES.index(quantity))
+        self.schedule_update()
+
+    def on_quantity_selected(self, index):
+        self.quantity = self.QUANTITIES[max(index, 0)]
@@ -0,0 +1,164 @@
+"""Coalesce plot updates and rasterize figures off the GUI thread.
+
+Plot widgets with a :class:`RenderScheduler` don't update and render
+synchronously on every parameter change (see
+:meth:`mpl_qt.ui.plot.PlotWidget.schedule_update`):
+
+1. Update requests within one frame interval are collapsed into a single
+   :meth:`~mpl_qt.ui.plot.PlotWidget.on_update` per widget.
+2. The Agg rasterization of the widget's canvas runs in a worker thread
+   (QThreadPool).
+3. The finished buffer is completed (blitting background, animated
+   artists) and shown on the GUI thread
+   (:meth:`~mpl_qt.ui.plot.PlotWidget.on_render_finished`).
+
+Renders superseded by a newer render of the same widget before they started
+are skipped. Widgets are not updated while their canvas is being rasterized,
+their requests are deferred to the next frame interval instead. Other changes
+of the artists on the GUI thread (redraws, view changes, overlays) wait for
+the rasterization, they hold the draw lock of the canvas
+(:attr:`mpl_qt.ui.plot.FigureCanvas.draw_lock`), like painting the buffer.
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import logging
+import threading
+
+from PySide import QtCore
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RenderScheduler(QtCore.QObject):
+    """Coalesce update requests and render in worker threads.
+
+    Parameters
+    ----------
+    parent : QtCore.QObject
+    interval : int
+        Frame interval (ms).
+    """
+
+    #: Emitted (from the worker thread) with widget and generation when a
+    #: render finished.
+    finished = QtCore.Signal(object, int)
+
+    def __init__(self, parent=None, interval=40):
+        super(RenderScheduler, self).__init__(parent)
+        self._pending = []
+        self._generation = {}
+        self._busy = set()
+        self._lock = threading.Lock()
+        self._pool = QtCore.QThreadPool.globalInstance()
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.on_timeout)
+        self.finished.connect(self.on_finished)
+
+    def request(self, widget):
+        """Update widget (on_update) within the next frame interval."""
+        if widget not in self._pending:
+            self._pending.append(widget)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def render(self, widget):
+        """Rasterize the canvas of widget in a worker thread.
+
+        A render of widget queued before and not yet started is skipped.
+        """
+        with self._lock:
+            generation = self._generation.get(widget, 0) + 1
+            self._generation[widget] = generation
+        self._pool.start(_RenderTask(self, widget, generation))
+
+    def forget(self, widget):
+        """Drop the pending update and the renders of widget (eg. before it
+        is deleted), a running render is not shown."""
+        if widget in self._pending:
+            self._pending.remove(widget)
+        with self._lock:
+            self._generation.pop(widget, None)
+
+    def on_timeout(self):
+        pending, self._pending = self._pending, []
+        for widget in pending:
+            with self._lock:
+                busy = widget in self._busy
+            if busy:
+                # don't touch the artists during the rasterization
+                self.request(widget)
+            else:
+                widget.on_update()
+
+    def on_finished(self, widget, generation):
+        if self._is_current(widget, generation):
+            widget.on_render_finished()
+
+    def _is_current(self, widget, generation):
+        with self._lock:
+            return self._generation.get(widget) == generation
+
+    def _run(self, widget, generation):
+        """Rasterize (worker thread)."""
+        with self._lock:
+            if self._generation.get(widget) != generation:
+                LOGGER.debug("skip stale render")
+                return
+            self._busy.add(widget)
+        try:
+            widget.canvas.draw_buffer()
+        finally:
+            with self._lock:
+                self._busy.discard(widget)
+        self.finished.emit(widget, generation)
+
+
+class StreamTimer(QtCore.QObject):
+    """Publish the latest frame of a streaming model at a capped rate.
+
+    Frames pushed between two ticks are dropped (see
+    :meth:`mpl_qt.model.StreamModel.publish`), the views update at most
+    once per tick (and per frame interval of their scheduler).
+
+    Parameters
+    ----------
+    model : mpl_qt.model.StreamModel
+    rate : float
+        Maximum number of frames per second.
+    parent : QtCore.QObject
+    """
+
+    def __init__(self, model, rate=25, parent=None):
+        super(StreamTimer, self).__init__(parent)
+        self.model = model
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(int(1000 / rate))
+        self._timer.timeout.connect(self.on_timeout)
+
+    def start(self):
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def on_timeout(self):
+        self.model.publish()
+
+
+class _RenderTask(QtCore.QRunnable):
+
+    def __init__(self, scheduler, widget, generation):
+        super(_RenderTask, self).__init__()
+        self.scheduler = scheduler
+        self.widget = widget
+        self.generation = generation
+
+    def run(self):
+        self.scheduler._run(self.widget, self.generation)
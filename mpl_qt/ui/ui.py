@@ -2,74 +2,404 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import collections
 import numpy as np
 import logging
 
 from PySide import QtGui
 from PySide import QtCore
 
-import matplotlib
-matplotlib.use("Qt4Agg")
-matplotlib.rcParams['backend.qt4'] = 'PySide'
-
+import mpl_qt.loader as loader
+from mpl_qt.model import QuiverModel
 import mpl_qt.ui.main as main
-import mpl_qt.ui.plot as plot
+import mpl_qt.ui.scheduler as scheduler
 
 
 LOGGER = logging.getLogger(__name__)
 
 
-class QuiverModel(object):
+class TableModel(QtCore.QAbstractTableModel):
+    """Table of positions and values.
+
+    The columns are views of the positions pxy and values vxy (no copies).
+    Cell texts are formatted per block of rows at once and kept in a bounded
+    cache. Rows are made available to the view in batches
+    (canFetchMore/fetchMore).
 
-    def __init__(self, pxy, vxy):
-        self.xy = pxy
-        self.xyvalue = vxy
+    Sorting keeps a permutation of the rows instead of reordering the data,
+    the permutations are cached per sort key. Filters are evaluated as
+    boolean masks over the columns, the masks are cached per predicate. The
+    visible rows are an index array into the columns combining both. The
+    caches are bounded in size (:attr:`CACHE_BYTES`), not in entries.
+    """
 
+    #: Number of rows formatted at once.
+    BLOCK_SIZE = 256
 
-class TableModel(QtCore.QAbstractTableModel):
+    #: Maximum number of formatted blocks kept.
+    CACHE_BLOCKS = 64
+
+    #: Number of rows made available per fetchMore.
+    FETCH_SIZE = 100000
+
+    #: Maximum total size (bytes) of the cached sort permutations, filter
+    #: masks and row indices (the ones in use are kept regardless).
+    CACHE_BYTES = 2**28
 
     def __init__(self, parent, pxy, vxy, *args):
-        if pxy.shape != vxy.shape:
-            raise ValueError("pxy and vxy have to be of same shape")
         super(TableModel, self).__init__(parent, *args)
-        self.model = np.concatenate([pxy, vxy], axis=1)
         self.header = ["x", "y", "xvalue", "yvalue"]
+        self._fetched = 0
+        self._blocks = collections.OrderedDict()
+        self._sort_key = None
+        self._filter_key = None
+        self._argsorts = collections.OrderedDict()
+        self._lexsorts = collections.OrderedDict()
+        self._masks = collections.OrderedDict()
+        self._indices = collections.OrderedDict()
+        self._set_data(pxy, vxy)
+
+    def _set_data(self, pxy, vxy):
+        if pxy.shape != vxy.shape:
+            raise ValueError("pxy and vxy have to be of same shape")
+        self._pxy = pxy
+        self._vxy = vxy
+        self.columns = [pxy[:, 0], pxy[:, 1], vxy[:, 0], vxy[:, 1]]
+        self._magnitude = None
+        self._argsorts.clear()
+        self._lexsorts.clear()
+        self._masks.clear()
+        self._indices.clear()
+        self._fetched = 0
+        self._update_index()
 
     def rowCount(self, parent):
-        return len(self.model)
+        return self._fetched
 
     def columnCount(self, parent):
-        return len(self.model[0])
+        return len(self.columns)
+
+    def canFetchMore(self, parent):
+        return self._fetched < self._nrows
+
+    def fetchMore(self, parent):
+        fetch = min(self._nrows - self._fetched, self.FETCH_SIZE)
+        self.beginInsertRows(QtCore.QModelIndex(),
+                             self._fetched, self._fetched + fetch - 1)
+        self._fetched += fetch
+        self.endInsertRows()
 
     def data(self, index, role):
         if not index.isValid():
             return None
         elif role != QtCore.Qt.DisplayRole:
             return None
-        return str(self.model[index.row(), index.column()])
+        block, row = divmod(index.row(), self.BLOCK_SIZE)
+        return str(self._block(block)[index.column()][row])
 
     def headerData(self, col, orientation, role):
         if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
             return self.header[col]
         return None
 
-#    def sort(self, col, order):
-    #        """sort table by given column number col"""
-    #        self.emit(SIGNAL("layoutAboutToBeChanged()"))
-    #        self.mylist = sorted(self.mylist,
-    #                             key=operator.itemgetter(col))
-    #        if order == Qt.DescendingOrder:
-        #            self.mylist.reverse()
-        #        self.emit(SIGNAL("layoutChanged()"))
+    def _block(self, block):
+        """Return the cell texts of a block of rows (one array per column).
+        """
+        try:
+            texts = self._blocks.pop(block)
+        except KeyError:
+            rows = self._rows(block * self.BLOCK_SIZE,
+                              (block + 1) * self.BLOCK_SIZE)
+            texts = [column[rows].astype(str) for column in self.columns]
+            while len(self._blocks) >= self.CACHE_BLOCKS:
+                self._blocks.popitem(last=False)
+        self._blocks[block] = texts
+        return texts
+
+    def _rows(self, start, stop):
+        """Return the indices into the columns of the table rows start to
+        stop."""
+        if self._index is None:
+            return slice(start, stop)
+        return self._index[start:stop]
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        """Sort table by given column number column.
+
+        Parameters
+        ----------
+        column : int
+            -1 (no sort indicator) shows the rows in data order.
+        order : QtCore.Qt.SortOrder
+        """
+        self.sort_by([(column, order)] if column >= 0 else [])
+
+    def sort_by(self, keys):
+        """Sort table by several columns.
+
+        Parameters
+        ----------
+        keys : sequence of (int, QtCore.Qt.SortOrder)
+            Columns and their sort order, primary key first.
+        """
+        LOGGER.debug("sort_by %s", keys)
+        self.layoutAboutToBeChanged.emit()
+        self._sort_key = tuple((column, order == QtCore.Qt.DescendingOrder)
+                               for column, order in keys) or None
+        self._update_index()
+        self.layoutChanged.emit()
+
+    def set_filter(self, ranges=None, magnitude=None):
+        """Show only the rows matching all predicates.
+
+        Parameters
+        ----------
+        ranges : dict, optional
+            Maps column numbers to (min, max) of the values to show, None for
+            an open bound.
+        magnitude : (float, float), optional
+            (min, max) of the magnitude of the values (xvalue, yvalue) to
+            show, None for an open bound.
+        """
+        predicates = []
+        for column, (vmin, vmax) in sorted((ranges or {}).items()):
+            predicates.append(("range", column, vmin, vmax))
+        if magnitude is not None:
+            predicates.append(("magnitude", magnitude[0], magnitude[1]))
+        LOGGER.debug("set_filter %s", predicates)
+
+        self.beginResetModel()
+        self._filter_key = tuple(predicates) or None
+        self._update_index()
+        self.endResetModel()
+
+    def clear_filter(self):
+        """Show all rows."""
+        self.set_filter()
+
+    @property
+    def row_index(self):
+        """Read-only array of the data rows (model point indices) shown as
+        table rows, in table order (sorted and filtered, including rows not
+        fetched yet), ``np.arange(n)`` if neither sorted nor filtered."""
+        if self._index is None:
+            index = np.arange(len(self.columns[0]))
+        else:
+            # the cached index is shared, do not let callers change it
+            index = self._index.view()
+        index.flags.writeable = False
+        return index
+
+    def on_model_changed(self, model, change):
+        """Update the table after a change of model (see
+        :meth:`mpl_qt.model.QuiverModel.subscribe`).
+
+        Only the caches depending on the changed columns are dropped. Unless
+        the current sort order or filter depends on them, only the changed
+        rows are reported to the view (dataChanged).
+
+        Parameters
+        ----------
+        model : mpl_qt.model.QuiverModel
+        change : mpl_qt.model.ModelChange
+        """
+        LOGGER.debug("on_model_changed %s", change)
+        if model.xy is not self._pxy or model.xyvalue is not self._vxy:
+            self.beginResetModel()
+            self._set_data(model.xy, model.xyvalue)
+            self.endResetModel()
+            return
+
+        columns = set()
+        if change.positions:
+            columns.update((0, 1))
+        if change.values:
+            columns.update((2, 3))
+            self._magnitude = None
+        for column in columns:
+            self._argsorts.pop(column, None)
+        for cache, keys in [(self._lexsorts, lambda key: (key, None)),
+                            (self._masks, lambda key: (None, key)),
+                            (self._indices, lambda key: key)]:
+            for key in list(cache):
+                if columns & self._key_columns(keys(key)):
+                    del cache[key]
+
+        if columns & self._key_columns((self._sort_key, self._filter_key)):
+            self.beginResetModel()
+            self._update_index()
+            self.endResetModel()
+            return
+
+        stop = len(self.columns[0]) if change.stop is None else change.stop
+        if self._index is None:
+            rows = np.arange(change.start, min(stop, self._fetched))
+        else:
+            rows = np.flatnonzero((self._index >= change.start) &
+                                  (self._index < stop))
+            rows = rows[rows < self._fetched]
+        if rows.shape[0] == 0:
+            return
+        for block in set(rows // self.BLOCK_SIZE):
+            self._blocks.pop(block, None)
+        self.dataChanged.emit(self.index(int(rows[0]), min(columns)),
+                              self.index(int(rows[-1]), max(columns)))
+
+    @staticmethod
+    def _key_columns(key):
+        """Return the columns a (sort key, filter key) depends on."""
+        sort_key, filter_key = key
+        columns = set(column for column, _ in sort_key or ())
+        for predicate in filter_key or ():
+            if predicate[0] == "range":
+                columns.add(predicate[1])
+            else:
+                columns.update((2, 3))
+        return columns
+
+    def _update_index(self):
+        """Combine sort permutation and filter mask to the visible rows."""
+        key = self._sort_key, self._filter_key
+        if key == (None, None):
+            self._index = None
+        else:
+            self._index = self._cached(self._indices, key, self._make_index)
+        self._nrows = (len(self.columns[0]) if self._index is None
+                       else self._index.shape[0])
+        self._fetched = min(self._nrows, max(self._fetched, self.FETCH_SIZE))
+        self._blocks.clear()
+
+    def _make_index(self, key):
+        sort_key, filter_key = key
+        order = None if sort_key is None else self._permutation(sort_key)
+        if filter_key is None:
+            return order
+        mask = self._cached(self._masks, filter_key, self._make_mask)
+        if order is None:
+            return np.flatnonzero(mask)
+        return order[mask[order]]
+
+    def _make_mask(self, filter_key):
+        """Evaluate a filter (tuple of predicates) as boolean mask."""
+        if len(filter_key) > 1:
+            mask = np.ones(len(self.columns[0]), dtype=bool)
+            for predicate in filter_key:
+                mask &= self._cached(self._masks, (predicate,),
+                                     self._make_mask)
+            return mask
+
+        predicate = filter_key[0]
+        if predicate[0] == "range":
+            values = self.columns[predicate[1]]
+        else:
+            if self._magnitude is None:
+                self._magnitude = np.hypot(self.columns[2], self.columns[3])
+            values = self._magnitude
+        vmin, vmax = predicate[-2:]
+        mask = np.ones(len(values), dtype=bool)
+        if vmin is not None:
+            mask &= values >= vmin
+        if vmax is not None:
+            mask &= values <= vmax
+        return mask
+
+    def _cached(self, cache, key, make):
+        """Return cache[key], created by make(key) if missing.
+
+        The least recently used entries of cache are dropped while all
+        caches together exceed :attr:`CACHE_BYTES`.
+        """
+        try:
+            value = cache.pop(key)
+        except KeyError:
+            value = make(key)
+            while cache and (self._cache_nbytes() + value.nbytes >
+                             self.CACHE_BYTES):
+                cache.popitem(last=False)
+        cache[key] = value
+        return value
+
+    def _cache_nbytes(self):
+        """Return the total size of the cached arrays (views counted in
+        full)."""
+        return sum(value.nbytes
+                   for cache in (self._argsorts, self._lexsorts,
+                                 self._masks, self._indices)
+                   for value in cache.values())
+
+    def _permutation(self, keys):
+        """Return (cached) row permutation sorting by keys.
+
+        A descending single column sort is the reversed (view of the)
+        ascending permutation.
+
+        Parameters
+        ----------
+        keys : tuple of (int, bool)
+            Columns and whether to sort descending, primary key first.
+        """
+        if len(keys) == 1:
+            column, descending = keys[0]
+            order = self._cached(self._argsorts, column, self._argsort)
+            return order[::-1] if descending else order
+        return self._cached(self._lexsorts, keys, self._lexsort)
+
+    def _argsort(self, column):
+        return np.argsort(self.columns[column], kind="mergesort")
+
+    def _lexsort(self, keys):
+        # np.lexsort: last key is the primary key
+        return np.lexsort([-self.columns[column] if descending
+                           else self.columns[column]
+                           for column, descending in reversed(keys)])
 
 
 class MainWindow(QtGui.QMainWindow, main.Ui_MainWindow):
+    """
+    Parameters
+    ----------
+    parent : QtGui.QWidget
+    model : QuiverModel, optional
+        Defaults to :meth:`sample_model`.
+    stats_log : file, optional
+        Stream the render statistics of the plots are written to (JSON
+        lines, see :mod:`mpl_qt.instrument`).
+    """
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, model=None, stats_log=None):
         super(MainWindow, self).__init__(parent)
         self.setupUi(self)
+        self.scheduler = scheduler.RenderScheduler(self)
+        self.stats_log = stats_log
+        self.show_stats = False
+        self.residual = False
+        self.stream_timer = None
+        self.model = None
+        self.quiver_plot = None
+        self.mesh_plot = None
+        self.heatmap_plot = None
+        self.table_view = None
+        self.tmodel = None
+
+        # live updates while typing, coalesced by the scheduler
+        self.scaleEdit.textEdited.connect(self.on_edit_scale)
+        self.scaleEdit.editingFinished.connect(self.on_edit_scale)
+        self.keylengthEdit.editingFinished.connect(self.on_edit_key_length)
+        self.actionOpen.triggered.connect(self.on_open)
+        self.tabWidget.currentChanged.connect(self.on_tab_changed)
+        self.statsShortcut = QtGui.QShortcut(QtGui.QKeySequence("F12"), self)
+        self.statsShortcut.activated.connect(self.on_toggle_stats)
+        self.residualShortcut = QtGui.QShortcut(QtGui.QKeySequence("Ctrl+R"),
+                                                self)
+        self.residualShortcut.activated.connect(self.on_toggle_residual)
 
-        # define model
+        if model is None:
+            model = self.sample_model()
+        self.set_model(model)
+
+    @staticmethod
+    def sample_model():
+        """Return a rotated 5x5 grid."""
         gx, gy = np.meshgrid(np.linspace(-5, 5, 5), np.linspace(-5, 5, 5))
         pxy = np.array([gx.flatten(), gy.flatten()]).T
         phi = 0.5 * np.pi
@@ -78,32 +408,204 @@ class MainWindow(QtGui.QMainWindow, main.Ui_MainWindow):
         pxy2 = np.dot(pxy, m)
         #pxy2 = pxy + np.array([1, 0])
         vxy = pxy - pxy2
+        return QuiverModel(pxy, vxy)
+
+    def set_model(self, model):
+        """Show model in all views (replacing the current views).
 
+        All views share the arrays of the model, no copies are made. Models
+        with a ``publish`` method (:class:`mpl_qt.model.StreamModel`) are
+        published by a :class:`mpl_qt.ui.scheduler.StreamTimer` and animated
+        in the plots. The
+        views are built when their tab is shown first, the current one after
+        returning to the event loop (so the window appears before the first
+        plot is rendered). The spatial index of the positions (picking and
+        hover) is built after the first view.
+        """
         # set up views and signals and slots
         LOGGER.debug("set up")
-        self.model = QuiverModel(pxy, vxy)
+        self._tab_factories = {}
+        if self.stream_timer is not None:
+            self.stream_timer.stop()
+            self.stream_timer.deleteLater()
+            self.stream_timer = None
+        self._delete_views()
+        self.model = model
+        if hasattr(model, "publish"):
+            self.stream_timer = scheduler.StreamTimer(model, parent=self)
+            self.stream_timer.start()
+        # initialized by the first plot
+        self.scaleEdit.setText("")
+        self.keylengthEdit.setText("")
+
+        factories = {}
+        for name, factory in [("quiver", self._make_quiver_plot),
+                              ("mesh", self._make_mesh_plot),
+                              ("heatmap", self._make_heatmap_plot),
+                              ("data", self._make_table_view)]:
+            page = QtGui.QWidget()
+            layout = QtGui.QVBoxLayout(page)
+            layout.setContentsMargins(0, 0, 0, 0)
+            factories[page] = factory
+            self.tabWidget.addTab(page, name)
+        # registered after addTab, which already emits currentChanged
+        self._tab_factories = factories
+        QtCore.QTimer.singleShot(0, self._build_current_tab)
+        QtCore.QTimer.singleShot(0, model.point_index)
+
+    def _delete_views(self):
+        """Unsubscribe the views from the current model, drop them from the
+        scheduler and delete the tab pages (removeTab keeps them alive, and
+        with them the figures, caches and the data of the model)."""
+        unsubscribe = getattr(self.model, "unsubscribe", None)
+        for widget in self.plots():
+            self.scheduler.forget(widget)
+            if unsubscribe is not None:
+                unsubscribe(widget.on_model_changed)
+        if self.tmodel is not None:
+            if unsubscribe is not None:
+                unsubscribe(self.tmodel.on_model_changed)
+            # a child of the window, not of the page
+            self.tmodel.deleteLater()
+        while self.tabWidget.count():
+            page = self.tabWidget.widget(0)
+            self.tabWidget.removeTab(0)
+            page.deleteLater()
+        self.quiver_plot = None
+        self.mesh_plot = None
+        self.heatmap_plot = None
+        self.table_view = None
+        self.tmodel = None
+
+    def _build_current_tab(self):
+        self.on_tab_changed(self.tabWidget.currentIndex())
+
+    def on_tab_changed(self, index):
+        """Build the view of tab index when it is shown first."""
+        page = self.tabWidget.widget(index)
+        factory = self._tab_factories.pop(page, None)
+        if factory is not None:
+            LOGGER.debug("build tab %d", index)
+            page.layout().addWidget(factory())
+
+    def _make_quiver_plot(self):
+        # matplotlib is imported with the first plot (startup time)
+        import mpl_qt.ui.plot as plot
         self.quiver_plot = plot.QuiverPlotWidget(parent=self, model=self.model)
+        return self._setup_plot(self.quiver_plot, "quiver")
+
+    def _make_mesh_plot(self):
+        import mpl_qt.ui.plot as plot
         self.mesh_plot = plot.MeshplotWidget(parent=self, model=self.model)
+        return self._setup_plot(self.mesh_plot, "mesh")
 
-        self.tabWidget.addTab(self.quiver_plot, "quiver")
-        self.tabWidget.addTab(self.mesh_plot, "mesh")
+    def _make_heatmap_plot(self):
+        import mpl_qt.ui.plot as plot
+        self.heatmap_plot = plot.HeatmapPlotWidget(parent=self,
+                                                   model=self.model)
+        return self._setup_plot(self.heatmap_plot, "heatmap")
 
+    def _make_table_view(self):
         self.table_view = QtGui.QTableView()
-        self.tmodel = TableModel(self, pxy, vxy)
+        self.tmodel = TableModel(self, self.model.xy, self.model.xyvalue)
+        self.model.subscribe(self.tmodel.on_model_changed)
         self.table_view.setModel(self.tmodel)
-        self.tabWidget.addTab(self.table_view, "data")
+        # no sort indicator: the table is sorted when a header is clicked,
+        # not (argsort of a whole column) when it is created
+        self.table_view.horizontalHeader().setSortIndicator(
+            -1, QtCore.Qt.AscendingOrder)
+        self.table_view.setSortingEnabled(True)
+        return self.table_view
 
-        self.scaleEdit.setText(str(self.quiver_plot.scale))
-        self.scaleEdit.editingFinished.connect(self.on_edit_scale)
-        self.keylengthEdit.setText(str(self.quiver_plot.key_length))
-        self.keylengthEdit.editingFinished.connect(self.on_edit_key_length)
+    def _setup_plot(self, widget, name):
+        """Connect a new plot widget to the scheduler, the statistics and the
+        edits."""
+        widget.scheduler = self.scheduler
+        widget.stats.name = name
+        widget.stats.log = self.stats_log
+        widget.show_stats = self.show_stats
+        widget.animated = self.stream_timer is not None
+        if self.residual:
+            widget.residual = True
+        widget.point_picked.connect(self.on_point_picked)
+        self._apply_edits(widget)
+        return widget
+
+    def _apply_edits(self, widget):
+        """Set scale (and key length) of a new plot widget from the edits,
+        or initialize empty edits from the widget."""
+        edits = [("scale", self.scaleEdit)]
+        if hasattr(widget, "key_length"):
+            edits.append(("key_length", self.keylengthEdit))
+        for name, edit in edits:
+            try:
+                value = float(edit.text())
+            except ValueError:
+                # eg. no key length before the first frame of a stream
+                if np.isfinite(getattr(widget, name)):
+                    edit.setText(str(getattr(widget, name)))
+                continue
+            if value != getattr(widget, name):
+                setattr(widget, name, value)
+
+    def open(self, filename):
+        """Load filename (see :func:`mpl_qt.loader.load`) and show it."""
+        LOGGER.info("open %s", filename)
+        self.set_model(loader.load(filename))
+        self.setWindowTitle("mpl qt main - {}".format(filename))
+
+    def on_open(self):
+        LOGGER.debug("on_open")
+        filename, _ = QtGui.QFileDialog.getOpenFileName(
+            self, "Open", "", "Data files (*.npy *.h5 *.hdf5)")
+        if filename:
+            self.open(filename)
+
+    def plots(self):
+        """Return the plot widgets built so far."""
+        return [widget for widget in [self.quiver_plot, self.mesh_plot,
+                                      self.heatmap_plot]
+                if widget is not None]
+
+    def on_point_picked(self, i, text):
+        self.statusbar.showMessage(text.replace("\n", ", "))
+
+    def on_toggle_stats(self):
+        """Show/hide the render statistics on all plots."""
+        self.show_stats = not self.show_stats
+        for widget in self.plots():
+            widget.show_stats = self.show_stats
+
+    def on_toggle_residual(self):
+        """Show the non-affine residual of the values (see
+        :meth:`mpl_qt.model.QuiverModel.residual_values`) or the values in
+        all plots."""
+        self.residual = not self.residual
+        for widget in self.plots():
+            widget.residual = self.residual
+        if self.quiver_plot is not None:
+            # the key length follows the values shown
+            self.quiver_plot.key_length = None
+            self.keylengthEdit.setText("")
+            self._apply_edits(self.quiver_plot)
+        self.statusbar.showMessage("non-affine residual" if self.residual
+                                   else "values")
 
     def on_edit_key_length(self):
         LOGGER.debug("on_edit_key_length")
-        self.quiver_plot.key_length = float(self.keylengthEdit.text())
+        try:
+            key_length = float(self.keylengthEdit.text())
+        except ValueError:
+            return
+        if self.quiver_plot is not None:
+            self.quiver_plot.key_length = key_length
 
     def on_edit_scale(self):
         LOGGER.debug("on_edit_scale")
-        scale = float(self.scaleEdit.text())
-        self.quiver_plot.scale = scale
-        self.mesh_plot.scale = scale
+        try:
+            scale = float(self.scaleEdit.text())
+        except ValueError:
+            # incomplete input while typing
+            return
+        for widget in self.plots():
+            widget.scale = scale
@@ -51,7 +51,7 @@ def setup_package():
         keywords = "matplotlib, PySide",
         url = "https://github.com/michaelhaberler/mpl_qt",
         packages=['mpl_qt', 'mpl_qt.ui'],
-        scripts=['bin/mpl_qt'],
+        scripts=['bin/mpl_qt', 'bin/mpl_qt_render'],
         package_data={'': ['README.md']},
         long_description=read('README.md'),
         classifiers=[
@@ -0,0 +1,79 @@
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+
+from mpl_qt import affine
+
+
+def _matrix(tx, ty, sx, sy, phi):
+    c, s = np.cos(phi), np.sin(phi)
+    return np.array([[sx * c, -sx * s, 0.0],
+                     [sy * s, sy * c, 0.0],
+                     [tx, ty, 1.0]])
+
+
+def _positions(n=50):
+    return np.random.RandomState(0).uniform(-10, 10, (n, 2))
+
+
+def test_homogeneous_coords():
+    xy = np.arange(6.0).reshape(3, 2)
+    h = affine.homogeneous_coords(xy)
+    assert h.shape == (3, 3)
+    np.testing.assert_array_equal(h[:, :2], xy)
+    np.testing.assert_array_equal(h[:, 2], 1.0)
+
+
+def test_linear_transformation_recovers_the_transformation():
+    xy = _positions()
+    m = _matrix(1.5, -2.0, 1.1, 0.9, 0.3)
+    np.testing.assert_allclose(
+        affine.linear_transformation(xy, affine.transform(xy, m)), m,
+        atol=1e-12)
+
+
+def test_decompose():
+    m = _matrix(1.5, -2.0, 1.1, 0.9, 0.3)
+    np.testing.assert_allclose(affine.decompose(m),
+                               (1.5, -2.0, 1.1, 0.9, 0.3))
+
+
+def test_batched_frames():
+    xy = _positions()
+    ms = np.array([_matrix(k, -k, 1 + 0.1 * k, 1.0, 0.1 * k)
+                   for k in range(4)])
+    frames = affine.transform(xy, ms)
+    assert frames.shape == (4,) + xy.shape
+    fitted, residuals = affine.AffineFit(xy).fit(frames)
+    np.testing.assert_allclose(fitted, ms, atol=1e-12)
+    np.testing.assert_allclose(residuals, 0.0, atol=1e-12)
+
+
+def test_displacements_and_residuals():
+    xy = _positions()
+    m = _matrix(0.5, 0.2, 1.01, 0.99, 0.01)
+    noise = np.zeros_like(xy)
+    noise[7] = [0.3, -0.1]
+    displacements = affine.transform(xy, m) - xy + noise
+    fit = affine.AffineFit(xy)
+    fitted, residuals = fit.fit(displacements, displacements=True)
+    np.testing.assert_allclose(fitted, m, atol=0.05)
+    # the residuals are the non-affine part: positions minus the fit
+    np.testing.assert_allclose(
+        residuals, xy + displacements - affine.transform(xy, fitted),
+        atol=1e-12)
+    assert np.argmax(np.hypot(residuals[:, 0], residuals[:, 1])) == 7
+
+
+def test_non_finite_reference_positions_are_not_fitted():
+    xy = _positions()
+    xy[[2, 5]] = np.nan
+    m = _matrix(1.0, 2.0, 1.0, 1.0, 0.2)
+    frames = affine.transform(xy, m)
+    fitted, residuals = affine.AffineFit(xy).fit(frames)
+    np.testing.assert_allclose(fitted, m, atol=1e-12)
+    assert np.isnan(residuals[[2, 5]]).all()
+    np.testing.assert_allclose(np.delete(residuals, [2, 5], axis=0), 0.0,
+                               atol=1e-12)
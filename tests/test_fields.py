@@ -0,0 +1,89 @@
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+import pytest
+import matplotlib.tri as mtri
+
+from mpl_qt import fields
+
+
+#: Displacement gradient of the linear displacements used by the tests.
+GRADIENT = np.array([[0.02, 0.01],
+                     [-0.03, 0.05]])
+
+
+def _grid(nx=6, ny=5, dx=0.5, dy=2.0):
+    x, y = np.meshgrid(dx * np.arange(nx), dy * np.arange(ny), indexing="ij")
+    return np.stack([x, y], axis=-1)
+
+
+def test_displacement_gradient_of_linear_displacements():
+    grid = _grid()
+    gradient = fields.displacement_gradient(grid, grid.dot(GRADIENT.T))
+    assert gradient.shape == (5, 4, 2, 2)
+    np.testing.assert_allclose(gradient, np.broadcast_to(GRADIENT,
+                                                          gradient.shape))
+
+
+def test_missing_grid_points():
+    grid = _grid()
+    grid[2, 3] = np.nan
+    gradient = fields.displacement_gradient(grid, grid.dot(GRADIENT.T))
+    nan_cells = np.isnan(gradient).any(axis=(2, 3))
+    # the four cells touching the missing point
+    assert nan_cells.sum() == 4
+    assert nan_cells[1:3, 2:4].all()
+
+
+def test_triangle_gradient_of_linear_displacements():
+    rng = np.random.RandomState(0)
+    xy = rng.uniform(0, 10, (40, 2))
+    triangles = mtri.Triangulation(xy[:, 0], xy[:, 1]).triangles
+    gradient = fields.triangle_gradient(xy, triangles, xy.dot(GRADIENT.T))
+    assert gradient.shape == (len(triangles), 2, 2)
+    np.testing.assert_allclose(gradient, np.broadcast_to(GRADIENT,
+                                                         gradient.shape))
+
+
+def test_degenerate_triangles():
+    xy = np.array([[0.0, 0.0], [1.0, 0.0], [2.0, 0.0], [0.0, 1.0]])
+    gradient = fields.triangle_gradient(xy, np.array([[0, 1, 2], [0, 1, 3]]),
+                                        xy)
+    assert np.isnan(gradient[0]).all()
+    np.testing.assert_allclose(gradient[1], np.eye(2))
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("exx", 0.02),
+    ("eyy", 0.05),
+    ("exy", -0.01),
+    ("shear", np.hypot(-0.015, -0.01)),
+    ("rotation", -0.02),
+    ("area", 1.02 * 1.05 + 0.01 * 0.03 - 1),
+    ("divergence", 0.07),
+    ("curl", -0.04),
+])
+def test_derived_field(name, expected):
+    assert name in fields.FIELDS
+    gradient = np.broadcast_to(GRADIENT, (3, 4, 2, 2))
+    field = fields.derived_field(name, gradient)
+    assert field.shape == (3, 4)
+    np.testing.assert_allclose(field, expected)
+
+
+def test_area_change_of_the_deformed_cell():
+    grid = _grid(2, 2, 1.0, 1.0)
+    displaced = grid + grid.dot(GRADIENT.T)
+    # area of the displaced unit square (shoelace formula)
+    x, y = displaced[[0, 1, 1, 0], [0, 0, 1, 1]].T
+    area = 0.5 * abs(np.dot(x, np.roll(y, 1)) - np.dot(y, np.roll(x, 1)))
+    gradient = fields.displacement_gradient(grid, grid.dot(GRADIENT.T))
+    np.testing.assert_allclose(fields.derived_field("area", gradient),
+                               [[area - 1]])
+
+
+def test_unknown_field():
+    with pytest.raises(ValueError):
+        fields.derived_field("foo", GRADIENT)
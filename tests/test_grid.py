@@ -0,0 +1,92 @@
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+import pytest
+
+from mpl_qt import grid
+
+
+def _assert_grid_equal(actual, expected, rtol=1e-9):
+    start, end, step, num = actual
+    np.testing.assert_allclose([start, end, step], expected[:3], rtol=rtol)
+    assert num == expected[3]
+
+
+@pytest.mark.parametrize("max_unique", [50, 1000, grid.MAX_UNIQUE])
+def test_grid_sizes_jittered_grid(max_unique):
+    rng = np.random.RandomState(0)
+    x = np.tile(np.linspace(0.0, 10.0, 101), 50)
+    x += rng.uniform(-1e-6, 1e-6, x.shape)
+    expected = grid.grid_size(x)
+    assert expected[3] == 101
+    (actual,) = grid.grid_sizes(x, chunksize=512, max_unique=max_unique)
+    # the steps differ by the jitter
+    _assert_grid_equal(actual, expected, rtol=1e-4)
+
+
+def test_grid_sizes_jittered_2d_grid():
+    rng = np.random.RandomState(1)
+    xy = 0.5 * np.mgrid[0:300, 0:200].reshape(2, -1).T
+    xy += rng.uniform(-1e-8, 1e-8, xy.shape)
+    expected = [grid.grid_size(xy[:, k]) for k in range(2)]
+    actual = grid.grid_sizes(xy, chunksize=4096, max_unique=1000)
+    for a, e in zip(actual, expected):
+        _assert_grid_equal(a, e, rtol=1e-6)
+
+
+def test_grid_size():
+    x = np.repeat(np.linspace(-1.0, 2.0, 31), 3)
+    _assert_grid_equal(grid.grid_size(x), (-1.0, 2.0, 0.1, 31))
+
+
+def test_grid_size_missing_and_non_finite_values():
+    x = np.delete(np.linspace(0.0, 10.0, 11), [3, 4])
+    x = np.append(x, [np.nan, np.inf, -np.inf])
+    _assert_grid_equal(grid.grid_size(x), (0.0, 10.0, 1.0, 11))
+
+
+def test_grid_size_without_values():
+    assert grid.grid_size([np.nan]) == (0.0, 0.0, 0, 1)
+    assert grid.grid_sizes(np.empty((0, 2))) == [(0.0, 0.0, 0, 1)] * 2
+    assert grid.grid_size([3.0, 3.0])[2:] == (0, 1)
+
+
+@pytest.mark.parametrize("chunksize", [1, 7, 1000])
+def test_grid_sizes_equals_grid_size(chunksize):
+    rng = np.random.RandomState(2)
+    xy = np.mgrid[0:30, 0:20].reshape(2, -1).T * [0.3, 2.0] + [5.0, -1.0]
+    xy = xy[rng.permutation(len(xy))]
+    xy[::11] = np.nan
+    expected = [grid.grid_size(xy[:, k]) for k in range(2)]
+    for actual, e in zip(grid.grid_sizes(xy, chunksize=chunksize), expected):
+        _assert_grid_equal(actual, e)
+
+
+def test_grid_sizes_accepts_lists():
+    xy = [[0.0, 0.0], [1.0, 0.0], [0.0, 2.0], [1.0, 2.0]]
+    assert grid.grid_sizes(xy) == [(0.0, 1.0, 1.0, 2), (0.0, 2.0, 2.0, 2)]
+    assert grid.grid_size_chunked([0.0, 1.0, 2.0]) == (0.0, 2.0, 1.0, 3)
+
+
+def test_grid_sizes_thinned():
+    # more grid points than max_unique: thinned, step and num still exact
+    x = np.linspace(0.0, 99.9, 1000)
+    (actual,) = grid.grid_sizes(x, chunksize=100, max_unique=300)
+    _assert_grid_equal(actual, (0.0, 99.9, 0.1, 1000))
+
+
+def test_grid_index():
+    np.testing.assert_array_equal(
+        grid.grid_index([0.0, 0.49, 0.51, 2.0], 0.0, 1.0), [0, 0, 1, 2])
+    np.testing.assert_array_equal(grid.grid_index([1.0, 5.0], 1.0, 0),
+                                  [0, 0])
+
+
+def test_grid_nodes():
+    xy = np.array([[0.0, 0.0], [1.0, 0.0], [np.nan, 1.0], [1.0, 1.0],
+                   [0.0, 2.0]])
+    nodes = grid.grid_nodes(xy, [(0.0, 1.0, 1.0, 2), (0.0, 2.0, 1.0, 3)])
+    assert nodes.shape == (2, 3)
+    np.testing.assert_array_equal(nodes.filled(-1), [[0, -1, 4], [1, 3, -1]])
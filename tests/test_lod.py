@@ -0,0 +1,70 @@
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+
+from mpl_qt import lod
+
+
+def _field(n=64):
+    xy = np.mgrid[0:n, 0:n].reshape(2, -1).T.astype(float)
+    xyvalue = np.column_stack([np.sin(xy[:, 1] / 7.0), np.cos(xy[:, 0] / 5.0)])
+    return xy, xyvalue
+
+
+def test_levels_aggregate():
+    xy, xyvalue = _field()
+    cache = lod.QuiverLOD(xy, xyvalue)
+    for k in range(1, 5):
+        lxy, lvalue = cache.level(k)
+        assert lxy.shape == lvalue.shape
+        assert lxy.shape[0] < xy.shape[0]
+        assert np.all(lxy >= 0) and np.all(lxy <= 63)
+    assert cache.level(0)[0] is xy
+
+
+def test_level_cells():
+    xy, xyvalue = _field(16)
+    xyvalue[:] = 2.0
+    cache = lod.QuiverLOD(xy, xyvalue, base_step=1.0)
+    # cells of width 4 centered on 0, 4, ..., 16
+    lxy, lvalue = cache.level(2)
+    assert lxy.shape[0] == 25
+    np.testing.assert_allclose(lvalue, 2.0)
+
+
+def test_non_finite_positions_are_missing():
+    xy, xyvalue = _field()
+    xy[0] = np.nan
+    xy[5, 1] = np.inf
+    cache = lod.QuiverLOD(xy, xyvalue)
+    assert np.all(np.isfinite(cache.extent))
+    assert cache.extent == (0.0, 63.0, 0.0, 63.0)
+    for k in range(1, 4):
+        lxy, lvalue = cache.level(k)
+        assert np.all(np.isfinite(lxy))
+        assert np.all(np.isfinite(lvalue))
+
+
+def test_no_finite_positions():
+    xy = np.full((10, 2), np.nan)
+    cache = lod.QuiverLOD(xy, np.ones((10, 2)))
+    assert cache.extent == (0.0, 0.0, 0.0, 0.0)
+    assert cache.level(3)[0].shape == (0, 2)
+
+
+def test_view_selects_the_limits():
+    xy, xyvalue = _field()
+    cache = lod.QuiverLOD(xy, xyvalue)
+    vxy, vvalue = cache.view(0, (10, 20), (30, 40))
+    assert vxy.shape[0] == 11 * 11
+    assert np.all((vxy[:, 0] >= 10) & (vxy[:, 0] <= 20))
+
+
+def test_level_for_view():
+    xy, xyvalue = _field()
+    cache = lod.QuiverLOD(xy, xyvalue, base_step=1.0)
+    # 64 data units on 512 pixels: 8 pixels per point
+    assert cache.level_for_view((0, 64), (0, 64), 512, 512) == 0
+    assert cache.level_for_view((0, 64), (0, 64), 128, 128) == 2
@@ -0,0 +1,113 @@
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+import matplotlib.tri as mtri
+
+from mpl_qt import fields
+from mpl_qt import mesh
+
+
+def _shuffled_grid(nx=12, ny=9, seed=0):
+    xy = np.mgrid[0:nx, 0:ny].reshape(2, -1).T * [0.5, 2.0]
+    return xy[np.random.RandomState(seed).permutation(len(xy))]
+
+
+def test_cell_index():
+    index = mesh.cell_index((3, 2)).reshape(-1, mesh.CELL_NVERTS)
+    np.testing.assert_array_equal(index, [[0, 2, 3, 1, 0], [2, 4, 5, 3, 2]])
+    mask = np.zeros((3, 2), dtype=bool)
+    mask[0, 0] = True
+    np.testing.assert_array_equal(mesh.cell_index((3, 2), mask),
+                                  [2, 4, 5, 3, 2])
+
+
+def test_topology_grid_order():
+    xy = _shuffled_grid()
+    topology = mesh.MeshTopology(xy)
+    assert topology.shape == (12, 9)
+    assert topology.mask is None
+    x, y = np.mgrid[0:12, 0:9] * np.array([0.5, 2.0])[:, None, None]
+    np.testing.assert_array_equal(topology.grid, np.stack([x, y], axis=-1))
+    # the cells of the path are spanned by the grid
+    assert topology.index.shape == (11 * 8 * mesh.CELL_NVERTS,)
+
+
+def test_topology_missing_points():
+    xy = _shuffled_grid()
+    missing = np.flatnonzero((xy[:, 0] == 1.0) & (xy[:, 1] == 4.0))
+    xy[missing] = np.nan
+    topology = mesh.MeshTopology(xy)
+    assert topology.shape == (12, 9)
+    assert topology.mask.sum() == 1 and topology.mask[2, 2]
+    assert np.isnan(topology.grid[2, 2]).all()
+    assert topology.index.shape == ((11 * 8 - 4) * mesh.CELL_NVERTS,)
+
+
+def test_levels_cover_the_grid():
+    topology = mesh.MeshTopology(_shuffled_grid(37, 20))
+    for level in topology.levels:
+        assert level.ix[0] == 0 and level.ix[-1] == 36
+        assert level.iy[0] == 0 and level.iy[-1] == 19
+    assert topology.levels[-1].shape[0] <= 3
+
+
+def test_displaced_grid_and_field():
+    xy = _shuffled_grid()
+    xyvalue = 0.01 * xy[:, ::-1]
+    topology = mesh.MeshTopology(xy)
+    displaced = topology.displaced_grid(xyvalue, 10.0)
+    np.testing.assert_allclose(displaced,
+                               topology.grid + 0.1 * topology.grid[..., ::-1])
+    exy = topology.field("exy", xyvalue)
+    assert exy.shape == (11, 8)
+    np.testing.assert_allclose(exy, 0.01)
+
+
+def test_fields_do_not_depend_on_the_scale():
+    xy = _shuffled_grid()
+    xyvalue = np.random.RandomState(1).normal(0, 0.01, xy.shape)
+    topology = mesh.MeshTopology(xy)
+    area = topology.field("area", xyvalue).copy()
+    topology.displaced_verts(xyvalue, 100.0)
+    np.testing.assert_array_equal(topology.field("area", xyvalue), area)
+
+
+def test_values_changed():
+    xy = _shuffled_grid()
+    xyvalue = np.zeros_like(xy)
+    topology = mesh.MeshTopology(xy)
+    np.testing.assert_array_equal(topology.field("exx", xyvalue), 0.0)
+    xyvalue[:] = 0.1 * xy
+    topology.values_changed()
+    np.testing.assert_allclose(topology.field("exx", xyvalue), 0.1)
+
+
+def test_is_regular_grid():
+    xy = _shuffled_grid()
+    assert mesh.is_regular_grid(xy)
+    jittered = xy + np.random.RandomState(2).uniform(-1e-9, 1e-9, xy.shape)
+    assert mesh.is_regular_grid(jittered)
+    with_nan = xy.copy()
+    with_nan[:5] = np.nan
+    assert mesh.is_regular_grid(with_nan)
+    assert not mesh.is_regular_grid(xy[:40])
+    assert not mesh.is_regular_grid(
+        np.random.RandomState(3).uniform(0, 1, (100, 2)))
+
+
+def test_triangle_mesh():
+    xy = np.random.RandomState(4).uniform(0, 10, (30, 2))
+    triangulation = mtri.Triangulation(xy[:, 0], xy[:, 1])
+    triangles = mesh.TriangleMesh(xy, triangulation)
+    nedges = len(triangulation.edges)
+    assert triangles.verts.shape == (3 * nedges, 2)
+    assert np.isnan(triangles.verts[2::3]).all()
+    xyvalue = 0.1 * xy
+    verts = triangles.displaced_verts(xyvalue, 2.0)
+    np.testing.assert_allclose(verts[0::3], 1.2 * xy[triangulation.edges[:, 0]])
+    np.testing.assert_allclose(triangles.field("divergence", xyvalue), 0.2)
+    gradient = fields.triangle_gradient(xy, triangulation.triangles, xyvalue)
+    np.testing.assert_allclose(triangles.field("shear", xyvalue),
+                               fields.derived_field("shear", gradient))
@@ -0,0 +1,44 @@
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+
+from mpl_qt import raster
+
+
+def test_level_shapes_and_means():
+    image = np.arange(35.0).reshape(7, 5)
+    pyramid = raster.ImagePyramid(image, (0.0, 7.0, 0.0, 5.0))
+    level = pyramid.level(1)
+    assert level.shape == (4, 3)
+    assert level[0, 0] == np.mean([0, 1, 5, 6])
+    # odd border: only the existing cells
+    assert level[3, 2] == 34.0
+    assert pyramid.level(3).shape == (1, 1)
+
+
+def test_missing_cells_are_ignored():
+    image = np.ones((4, 4))
+    image[0, 0] = np.nan
+    image[2:, 2:] = np.nan
+    level = raster.ImagePyramid(image, (0, 4, 0, 4)).level(1)
+    np.testing.assert_array_equal(np.isnan(level), [[False, False],
+                                                    [False, True]])
+    np.testing.assert_allclose(level[~np.isnan(level)], 1.0)
+
+
+def test_view_window():
+    pyramid = raster.ImagePyramid(np.zeros((100, 50)), (0.0, 100.0, 0.0, 50.0))
+    window, extent = pyramid.view(0, (10.5, 20.5), (-5.0, 5.0))
+    assert window.shape == (11, 5)
+    assert extent == (10.0, 21.0, 0.0, 5.0)
+    window, extent = pyramid.view(2, (0, 100), (0, 50))
+    assert window.shape == (25, 13)
+
+
+def test_level_for_view():
+    pyramid = raster.ImagePyramid(np.zeros((1000, 1000)), (0, 1000, 0, 1000))
+    assert pyramid.level_for_view((0, 1000), (0, 1000), 1000, 1000) == 0
+    assert pyramid.level_for_view((0, 1000), (0, 1000), 250, 250) == 2
+    assert pyramid.level_for_view((0, 10), (0, 10), 250, 250) == 0
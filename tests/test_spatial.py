@@ -0,0 +1,65 @@
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+import pytest
+
+from mpl_qt import spatial
+
+
+def _brute_force(xy, x, y, max_distance=np.inf):
+    d2 = (xy[:, 0] - x)**2 + (xy[:, 1] - y)**2
+    d2[~np.isfinite(d2)] = np.inf
+    k = np.argmin(d2)
+    return int(k) if d2[k] <= max_distance**2 else None
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_nearest_equals_brute_force(seed):
+    rng = np.random.RandomState(seed)
+    xy = rng.uniform(-50, 50, (2000, 2))
+    index = spatial.PointIndex(xy)
+    # queries inside and outside of the points
+    for x, y in rng.uniform(-80, 80, (200, 2)):
+        assert index.nearest(x, y) == _brute_force(xy, x, y)
+
+
+def test_nearest_clustered_points():
+    rng = np.random.RandomState(3)
+    xy = np.concatenate([rng.normal(0, 0.01, (500, 2)),
+                         rng.normal(100, 0.01, (500, 2))])
+    index = spatial.PointIndex(xy)
+    for x, y in rng.uniform(-10, 110, (100, 2)):
+        assert index.nearest(x, y) == _brute_force(xy, x, y)
+
+
+def test_nearest_points_on_a_line():
+    xy = np.column_stack([np.linspace(0, 10, 101), np.zeros(101)])
+    index = spatial.PointIndex(xy)
+    assert index.nearest(5.04, 3.0) == 50
+    assert index.nearest(-1.0, 0.0) == 0
+
+
+def test_max_distance():
+    xy = np.array([[0.0, 0.0], [10.0, 10.0]])
+    index = spatial.PointIndex(xy)
+    assert index.nearest(1.0, 1.0, max_distance=2.0) == 0
+    assert index.nearest(5.0, 5.0, max_distance=2.0) is None
+
+
+def test_non_finite_positions_are_not_indexed():
+    rng = np.random.RandomState(4)
+    xy = rng.uniform(0, 10, (300, 2))
+    xy[::7] = np.nan
+    xy[3, 0] = np.inf
+    index = spatial.PointIndex(xy)
+    for x, y in rng.uniform(0, 10, (50, 2)):
+        k = index.nearest(x, y)
+        assert k == _brute_force(xy, x, y)
+        assert np.isfinite(xy[k]).all()
+
+
+def test_no_points():
+    index = spatial.PointIndex(np.full((3, 2), np.nan))
+    assert index.nearest(0.0, 0.0) is None
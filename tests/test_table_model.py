@@ -0,0 +1,88 @@
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+import numpy as np
+import pytest
+
+QtCore = pytest.importorskip("PySide.QtCore")
+ui = pytest.importorskip("mpl_qt.ui.ui")
+
+from mpl_qt.model import QuiverModel
+
+
+def _table(n=1000, seed=0):
+    rng = np.random.RandomState(seed)
+    # few distinct positions: ties between rows
+    xy = rng.randint(0, 10, (n, 2)).astype(float)
+    xyvalue = rng.normal(0, 1, (n, 2))
+    return ui.TableModel(None, xy, xyvalue), xy, xyvalue
+
+
+def test_unsorted_rows():
+    table, xy, xyvalue = _table()
+    np.testing.assert_array_equal(table.row_index, np.arange(len(xy)))
+
+
+@pytest.mark.parametrize("column", range(4))
+def test_sort(column):
+    table, xy, xyvalue = _table()
+    values = np.column_stack([xy, xyvalue])[:, column]
+    table.sort(column)
+    np.testing.assert_array_equal(table.row_index,
+                                  np.argsort(values, kind="mergesort"))
+    table.sort(column, QtCore.Qt.DescendingOrder)
+    assert np.all(np.diff(values[table.row_index]) <= 0)
+    table.sort(-1)
+    np.testing.assert_array_equal(table.row_index, np.arange(len(xy)))
+
+
+def test_sort_by_several_columns():
+    table, xy, xyvalue = _table()
+    table.sort_by([(0, QtCore.Qt.AscendingOrder),
+                   (1, QtCore.Qt.DescendingOrder)])
+    np.testing.assert_array_equal(table.row_index,
+                                  np.lexsort([-xy[:, 1], xy[:, 0]]))
+
+
+def test_filter():
+    table, xy, xyvalue = _table()
+    table.set_filter(ranges={0: (2, 5), 3: (None, 0.0)},
+                     magnitude=(0.5, None))
+    expected = ((xy[:, 0] >= 2) & (xy[:, 0] <= 5) & (xyvalue[:, 1] <= 0) &
+                (np.hypot(xyvalue[:, 0], xyvalue[:, 1]) >= 0.5))
+    np.testing.assert_array_equal(table.row_index, np.flatnonzero(expected))
+    table.sort(2)
+    rows = table.row_index
+    assert np.all(expected[rows]) and len(rows) == expected.sum()
+    assert np.all(np.diff(xyvalue[rows, 0]) >= 0)
+    table.clear_filter()
+    assert len(table.row_index) == len(xy)
+
+
+def test_row_index_is_read_only():
+    table, xy, xyvalue = _table()
+    table.sort(0)
+    with pytest.raises(ValueError):
+        table.row_index[0] = 1
+
+
+def test_model_changes_update_the_sort_order():
+    table, xy, xyvalue = _table()
+    model = QuiverModel(xy, xyvalue)
+    model.subscribe(table.on_model_changed)
+    table.sort(2)
+    model.update(xyvalue=-xyvalue[:10])
+    assert np.all(np.diff(model.xyvalue[table.row_index, 0]) >= 0)
+
+
+def test_caches_are_bounded_in_size():
+    table, xy, xyvalue = _table(10000)
+    table.CACHE_BYTES = 3 * xy[:, 0].nbytes
+    for column in range(4):
+        table.sort(column)
+        table.set_filter(ranges={column: (0.0, None)})
+        table.sort_by([(column, QtCore.Qt.AscendingOrder),
+                       ((column + 1) % 4, QtCore.Qt.AscendingOrder)])
+    # the arrays in use may exceed the budget
+    assert table._cache_nbytes() <= 2 * table.CACHE_BYTES